@@ -1,6 +1,20 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 import os
+import json
+import math
+import logging
 from utils import NewsExtractor, configure_dns
+from deadline import Deadline
+from recency import parse_since
+from metrics import registry, track_request
+from responses import json_response, parse_fields, project
+import profiling
+
+# LOG_LEVEL=WARNING turns the per-article progress lines down in production
+logging.basicConfig(
+    level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+    format='%(asctime)s level=%(levelname)s logger=%(name)s %(message)s'
+)
 
 app = Flask(__name__)
 
@@ -24,6 +38,68 @@ def initialize_extractor():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def parse_flag(value):
+    """A boolean request option; accepts JSON booleans and "true"/"false"-style strings."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in ('true', '1', 'yes', 'on'):
+        return True
+    if isinstance(value, str) and value.strip().lower() in ('false', '0', 'no', 'off', ''):
+        return False
+    raise ValueError(f"Invalid boolean value: {value!r}")
+
+def parse_analyze_options(data):
+    """Validate an analyze request body; returns (options, None) or (None, error response)."""
+    company_name = data.get('company_name')
+    timeout_seconds = data.get('timeout_seconds', extractor.default_budget)
+    llm_policy = data.get('llm_policy')
+    
+    if not company_name:
+        return None, (jsonify({"error": "Company name is required"}), 400)
+    
+    try:
+        timeout_seconds = float(timeout_seconds)
+    except (TypeError, ValueError):
+        return None, (jsonify({"error": "timeout_seconds must be a number"}), 400)
+    if not math.isfinite(timeout_seconds) or timeout_seconds <= 0:
+        return None, (jsonify({"error": "timeout_seconds must be a positive number"}), 400)
+    
+    if llm_policy is not None:
+        try:
+            # Only the mode is per request; the operator's confidence threshold and Gemini cap still apply
+            llm_policy = extractor.llm_policy.with_mode(llm_policy)
+        except ValueError as e:
+            return None, (jsonify({"error": str(e)}), 400)
+    
+    try:
+        since = parse_since(data.get('since'))
+        include_text = parse_flag(data.get('include_text', False))
+        speculative = parse_flag(data.get('speculative', extractor.speculative))
+        fields = parse_fields(request.args.get('fields') or data.get('fields'))
+    except ValueError as e:
+        return None, (jsonify({"error": str(e)}), 400)
+    
+    return {
+        "company_name": company_name,
+        "max_articles": data.get('max_articles', 10),
+        "include_text": include_text,
+        "llm_policy": llm_policy,
+        "timeout_seconds": timeout_seconds,
+        "since": since,
+        # Extract several candidates at once and keep the first that succeed
+        "speculative": speculative,
+        # Projection: only these fields go into the response (query string or body)
+        "fields": fields,
+    }, None
+
+def run_extraction(options, deadline):
+    return extractor.extract_and_analyze(
+        options["company_name"], max_articles=options["max_articles"], deadline=deadline,
+        keep_text=options["include_text"], llm_policy=options["llm_policy"], since=options["since"],
+        speculative=options["speculative"])
+
 @app.route('/api/analyze', methods=['POST'])
 def analyze_company():
     global extractor
@@ -31,22 +107,71 @@ def analyze_company():
     if not extractor:
         return jsonify({"error": "Extractor not initialized. Please provide API key first."}), 400
     
-    data = request.json
-    company_name = data.get('company_name')
-    max_articles = data.get('max_articles', 10)
+    options, error = parse_analyze_options(request.json)
+    if error:
+        return error
     
-    if not company_name:
-        return jsonify({"error": "Company name is required"}), 400
+    # None unless asked for (X-Profile header or ?profile=1) or picked by PROFILE_SAMPLE_RATE
+    profile_mode = profiling.requested(request.headers, request.args)
     
     try:
-        # Set max timeout for the request to prevent long-running requests
-        articles_data = extractor.extract_and_analyze(company_name, max_articles=max_articles)
-        formatted_output = extractor.format_data_for_output(company_name, articles_data)
+        with track_request() as request_metrics, \
+                profiling.profile_request(options["company_name"], profile_mode) as profile:
+            # Overall budget for the request; results analyzed before it runs out are returned as partial
+            deadline = Deadline(options["timeout_seconds"])
+            articles_data = run_extraction(options, deadline)
+            formatted_output = extractor.format_data_for_output(options["company_name"], articles_data, deadline=deadline)
         
-        return jsonify(formatted_output)
+        registry.inc("analysis_requests_total", status="success")
+        formatted_output["Metrics"] = request_metrics.to_dict()
+        response = json_response(project(formatted_output, options["fields"]))
+        if profile is not None:
+            response.headers['X-Profile-Id'] = profile.profile_id
+        return response
     except Exception as e:
+        registry.inc("analysis_requests_total", status="error")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/analyze/stream', methods=['POST'])
+def analyze_company_stream():
+    """Same analysis as /api/analyze, streamed as newline-delimited JSON events.
+    
+    The article results arrive as one "result" event, then the company-level
+    analysis as "delta" text events while Gemini generates it, then "done".
+    """
+    global extractor
+    
+    if not extractor:
+        return jsonify({"error": "Extractor not initialized. Please provide API key first."}), 400
+    
+    options, error = parse_analyze_options(request.json)
+    if error:
+        return error
+    
+    def generate():
+        with track_request() as request_metrics:
+            yield json.dumps({"type": "status", "message": f"Analyzing news for {options['company_name']}"}) + "\n"
+            try:
+                deadline = Deadline(options["timeout_seconds"])
+                articles_data = run_extraction(options, deadline)
+                events = extractor.stream_company_analysis(options["company_name"], articles_data, deadline=deadline)
+                try:
+                    for event in events:
+                        if event["type"] == "done":
+                            event["Metrics"] = request_metrics.to_dict()
+                        if event["type"] in ("result", "done") and options["fields"]:
+                            event = {"type": event["type"], **project(event, options["fields"])}
+                        yield json.dumps(event, default=str) + "\n"
+                finally:
+                    # On client disconnect Flask closes this generator; pass that on to cancel the Gemini stream
+                    events.close()
+                registry.inc("analysis_requests_total", status="success")
+            except Exception as e:
+                registry.inc("analysis_requests_total", status="error")
+                yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/api/translate', methods=['POST'])
 def translate_text():
     global extractor
@@ -93,6 +218,63 @@ def generate_speech():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/domains', methods=['GET'])
+def domain_health():
+    if not extractor:
+        return jsonify({"error": "Extractor not initialized. Please provide API key first."}), 400
+    
+    return jsonify({"domains": extractor.domain_health.snapshot()})
+
+@app.route('/api/domains/<domain>', methods=['GET', 'DELETE'])
+def domain_health_detail(domain):
+    if not extractor:
+        return jsonify({"error": "Extractor not initialized. Please provide API key first."}), 400
+    
+    if request.method == 'DELETE':
+        extractor.domain_health.reset(domain)
+        return jsonify({"status": "success", "message": f"Health history cleared for {domain}"})
+    
+    stats = extractor.domain_health.snapshot(domain)
+    if stats is None:
+        return jsonify({"error": f"No health data for {domain}"}), 404
+    return jsonify({"domain": domain, **stats})
+
+@app.route('/api/dns', methods=['GET'])
+def dns_stats():
+    cache = configure_dns()
+    return jsonify(cache.snapshot())
+
+@app.route('/api/profiles', methods=['GET'])
+def list_profiles():
+    if not profiling.authorized(request.headers):
+        return jsonify({"error": "Invalid or missing X-Profile-Token"}), 403
+    
+    return jsonify({"profiles": profiling.store.summaries()})
+
+@app.route('/api/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """One stored profile: JSON by default, ?format=text for the pstats listing, ?format=pstats for the raw file."""
+    if not profiling.authorized(request.headers):
+        return jsonify({"error": "Invalid or missing X-Profile-Token"}), 403
+    
+    report = profiling.store.get(profile_id)
+    if report is None:
+        return jsonify({"error": f"No profile {profile_id}"}), 404
+    
+    output_format = request.args.get('format', 'json')
+    if output_format == 'pstats':
+        if 'pstats' not in report:
+            return jsonify({"error": "Profile has no CPU data"}), 404
+        return Response(report['pstats'], mimetype='application/octet-stream',
+                        headers={'Content-Disposition': f'attachment; filename={profile_id}.pstats'})
+    if output_format == 'text':
+        return Response(report.get('text', ''), mimetype='text/plain')
+    return jsonify({key: value for key, value in report.items() if key != 'pstats'})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(registry.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/static/<path:filename>')
 def serve_static(filename):
     return send_file(os.path.join('static', filename))
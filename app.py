@@ -4,6 +4,7 @@ import json
 import pandas as pd
 import plotly.express as px
 import base64
+import gzip
 
 # Set page configuration
 st.set_page_config(
@@ -15,6 +16,18 @@ st.set_page_config(
 # Constants
 API_BASE_URL = "http://localhost:8000/api"  # Change this if your Flask app runs on a different port
 
+# Only the response fields this UI renders; the backend leaves out the rest
+RESULT_FIELDS = [
+    "title", "url", "sentiment", "sentiment_score", "summary", "topics",
+    "llm analysis", "comparison", "partial"
+]
+
+# Recency options offered in the UI, mapped to the API's `since` values
+TIME_WINDOWS = {"Any time": None, "Past 24 hours": "24h", "Past week": "7d", "Past month": "1m", "Past year": "1y"}
+
+# Bookkeeping fields left out of the downloaded analysis
+DOWNLOAD_EXCLUDED_KEYS = {"Metrics", "Deadline"}
+
 # Function to get base64 encoding of an audio file
 def get_audio_base64(file_url):
     try:
@@ -80,7 +93,7 @@ with st.sidebar:
 if st.session_state.api_key_validated:
     # Input section
     st.header("Analyze Company News")
-    col1, col2 = st.columns([3, 1])
+    col1, col2, col3 = st.columns([3, 1, 1])
     
     with col1:
         company_name = st.text_input("Company Name", placeholder="e.g., Apple, Microsoft, Tesla")
@@ -88,26 +101,65 @@ if st.session_state.api_key_validated:
     with col2:
         max_articles = st.slider("Maximum Articles", min_value=3, max_value=20, value=10)
     
+    with col3:
+        time_window = st.selectbox("Published", list(TIME_WINDOWS))
+    
     # Analyze button
     if st.button("Analyze News", key="analyze_button", disabled=not company_name):
-        with st.spinner(f"Analyzing news for {company_name}... This may take a few minutes."):
-            try:
+        results = None
+        status_placeholder = st.empty()
+        analysis_placeholder = st.empty()
+        try:
+            # Stream the analysis so the company-level summary renders as Gemini writes it
+            with st.spinner(f"Analyzing news for {company_name}... This may take a few minutes."):
                 response = requests.post(
-                    f"{API_BASE_URL}/analyze",
-                    json={"company_name": company_name, "max_articles": max_articles},
+                    f"{API_BASE_URL}/analyze/stream",
+                    json={"company_name": company_name, "max_articles": max_articles,
+                          "since": TIME_WINDOWS[time_window], "fields": RESULT_FIELDS},
+                    stream=True,
                     timeout=300  # 5 minute timeout
                 )
                 
-                if response.status_code == 200:
-                    st.session_state.analysis_results = response.json()
+                if response.status_code != 200:
+                    st.error(f"Error: {response.json().get('error', 'Unknown error')}")
+                else:
+                    analysis_text = ""
+                    for line in response.iter_lines(decode_unicode=True):
+                        if not line:
+                            continue
+                        event = json.loads(line)
+                        if event["type"] == "status":
+                            status_placeholder.info(event["message"])
+                        elif event["type"] == "result":
+                            results = {key: value for key, value in event.items() if key != "type"}
+                            status_placeholder.info(f"Found {len(results['Articles'])} articles. Writing the analysis...")
+                        elif event["type"] == "delta":
+                            analysis_text += event["text"]
+                            analysis_placeholder.info(analysis_text + " ▌")
+                        elif event["type"] == "replace":
+                            analysis_text = event["text"]
+                            analysis_placeholder.info(analysis_text)
+                        elif event["type"] == "done" and results is not None:
+                            results.update({key: value for key, value in event.items() if key != "type"})
+                        elif event["type"] == "error":
+                            st.error(f"Error: {event['error']}")
+            
+            if response.status_code == 200:
+                response.close()
+                status_placeholder.empty()
+                analysis_placeholder.empty()
+                
+                if results is not None and "LLM Analysis" in results:
+                    st.session_state.analysis_results = results
                     # Reset translation and speech when new analysis is done
                     st.session_state.hindi_translation = None
                     st.session_state.speech_file_url = None
-                    st.success("Analysis complete!")
-                else:
-                    st.error(f"Error: {response.json().get('error', 'Unknown error')}")
-            except requests.exceptions.RequestException as e:
-                st.error(f"Connection error: {str(e)}")
+                    if results.get("Partial"):
+                        st.warning("The time budget ran out before all articles were analyzed. Showing partial results.")
+                    else:
+                        st.success("Analysis complete!")
+        except requests.exceptions.RequestException as e:
+            st.error(f"Connection error: {str(e)}")
     
     # Display results if available
     if st.session_state.analysis_results:
@@ -235,15 +287,30 @@ if st.session_state.api_key_validated:
                     else:
                         st.error("Error loading audio file")
             
-            # Download results
+            # Download results as compact JSON, optionally gzipped
+            download_json = json.dumps(
+                {key: value for key, value in results.items() if key not in DOWNLOAD_EXCLUDED_KEYS},
+                separators=(",", ":"),
+                ensure_ascii=False
+            ).encode("utf-8")
+            download_name = f"{results['Company'].replace(' ', '_')}_news_analysis.json"
+            
             if st.download_button(
                 label="Download Analysis as JSON",
-                data=json.dumps(results, indent=4),
-                file_name=f"{results['Company'].replace(' ', '_')}_news_analysis.json",
+                data=download_json,
+                file_name=download_name,
                 mime="application/json",
                 key="download_json_button"
             ):
                 st.success("Download complete!")
+            
+            st.download_button(
+                label="Download Analysis as JSON (gzip)",
+                data=gzip.compress(download_json),
+                file_name=download_name + ".gz",
+                mime="application/gzip",
+                key="download_json_gz_button"
+            )
         
         with analysis_tabs[1]:
             # Articles tab view
@@ -339,6 +406,31 @@ if st.session_state.api_key_validated:
                     for topic in topics_data:
                         st.markdown(f"- {topic}")
                         
+            # Sentiment by topic
+            if "Comparison" in results and results["Comparison"].get("sentiment_by_topic"):
+                st.subheader("Sentiment by Topic")
+                
+                topic_sentiment = results["Comparison"]["sentiment_by_topic"]
+                topic_sentiment_df = pd.DataFrame({
+                    "Topic": list(topic_sentiment.keys()),
+                    "Average Sentiment": [v["avg_sentiment"] for v in topic_sentiment.values()],
+                    "Articles": [v["articles"] for v in topic_sentiment.values()]
+                })
+                
+                fig = px.bar(
+                    topic_sentiment_df,
+                    x="Average Sentiment",
+                    y="Topic",
+                    orientation="h",
+                    title="Average Sentiment for Shared Topics",
+                    color="Average Sentiment",
+                    color_continuous_scale="RdBu",
+                    hover_data=["Articles"],
+                    range_x=[-1, 1]
+                )
+                fig.add_vline(x=0, line_dash="dash", line_color="gray")
+                st.plotly_chart(fig, use_container_width=True)
+            
             # Sources Analysis
             if "Sources" in results:
                 st.subheader("News Sources")
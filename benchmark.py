@@ -0,0 +1,499 @@
+"""Offline benchmark for the news analysis pipeline.
+
+Serves recorded search and article pages from bench_fixtures/ on a local HTTP
+server and replaces Gemini, the translator and gTTS with canned fakes, so the
+full pipeline and the Flask endpoints can be measured without network access.
+
+Usage:
+    python benchmark.py --max-articles 5 10 20 --concurrency 1 4 --iterations 3
+    python benchmark.py --llm-latency 0.8 --http-latency 0.05 --compare bench_results/<previous>.json
+    python benchmark.py --flaky-rate 0.3 --flaky-delay 2 --speculative
+"""
+import argparse
+import glob
+import itertools
+import json
+import os
+import re
+import socket
+import sys
+import threading
+import time
+import tracemalloc
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import utils
+from domain_health import DomainHealthRegistry
+from local_analyzer import LLMPolicy, analyze_text
+from metrics import registry, track_request
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_fixtures')
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_results')
+
+
+def load_responses():
+    with open(os.path.join(FIXTURES_DIR, 'responses.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+# Article pages are linked under several host names (all served by the one local server), so domain
+# health and the triage diversity penalty see separate news sites as they would in production
+FIXTURE_HOSTS = ('acme-wire.bench.test', 'market-daily.bench.test', 'tech-ledger.bench.test')
+
+
+class FixtureServer:
+    """Local HTTP server for recorded search result and article pages."""
+
+    def __init__(self, latency=0.0, flaky_rate=0.0, flaky_delay=0.0):
+        self.latency = latency
+        # Share of article URLs that stall before answering, picked by URL so every run stalls the same ones
+        self.flaky_rate = flaky_rate
+        self.flaky_delay = flaky_delay
+        with open(os.path.join(FIXTURES_DIR, 'search.html'), encoding='utf-8') as f:
+            self.search_template = f.read()
+        self.articles = {}
+        for path in glob.glob(os.path.join(FIXTURES_DIR, 'articles', '*.html')):
+            with open(path, 'rb') as f:
+                self.articles[os.path.basename(path)] = f.read()
+        self.httpd = None
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def host_url(self, host):
+        return f"http://{host}:{self.httpd.server_address[1]}"
+
+    def getaddrinfo(self, resolve):
+        """socket.getaddrinfo that sends FIXTURE_HOSTS to this server and everything else to `resolve`."""
+        address = self.httpd.server_address[0]
+
+        def getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+            if host in FIXTURE_HOSTS:
+                host = address
+            return resolve(host, port, family, type, proto, flags)
+        return getaddrinfo
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                parsed = urlparse(self.path)
+                if parsed.path == '/search':
+                    start = int(parse_qs(parsed.query).get('start', ['0'])[0])
+                    hosts = itertools.cycle(FIXTURE_HOSTS)
+                    body = (re.sub(r'\{\{BASE_URL\}\}', lambda match: server.host_url(next(hosts)),
+                                   server.search_template)
+                            .replace('{{PAGE}}', str(start // 10))
+                            .encode('utf-8'))
+                elif parsed.path.startswith('/article/'):
+                    body = server.articles.get(parsed.path[len('/article/'):])
+                    if server.flaky_rate and zlib.crc32(self.path.encode()) % 1000 < server.flaky_rate * 1000:
+                        time.sleep(server.flaky_delay)
+                else:
+                    body = None
+
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGeminiModel:
+    """Stand-in for genai.GenerativeModel returning canned completions."""
+
+    def __init__(self, responses, latency=0.0):
+        self.responses = responses
+        self.latency = latency
+
+    def generate_content(self, prompt, generation_config=None, stream=False, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        if 'Article summaries' in prompt:
+            text = self.responses['gemini_analysis']
+        else:
+            text = self.responses['gemini_article']
+        if stream:
+            return self._stream(text)
+        return FakeResponse(text)
+
+    def _stream(self, text, words_per_chunk=4):
+        words = text.split(' ')
+        for start in range(0, len(words), words_per_chunk):
+            yield FakeResponse(' '.join(words[start:start + words_per_chunk]) + ' ')
+
+
+class FakeTranslator:
+    """Stand-in for deep_translator.GoogleTranslator."""
+
+    translation = ""
+    latency = 0.0
+
+    def __init__(self, source='auto', target='hi'):
+        self.source = source
+        self.target = target
+
+    def translate(self, text):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.translation
+
+
+class FakeTTS:
+    """Stand-in for gtts.gTTS that writes a tiny placeholder file."""
+
+    latency = 0.0
+
+    def __init__(self, text, lang='hi', slow=False):
+        self.text = text
+
+    def save(self, path):
+        if self.latency:
+            time.sleep(self.latency)
+        with open(path, 'wb') as f:
+            f.write(b'ID3')
+
+
+@contextmanager
+def patched(obj, name, value):
+    original = getattr(obj, name)
+    setattr(obj, name, value)
+    try:
+        yield
+    finally:
+        setattr(obj, name, original)
+
+
+@contextmanager
+def offline_environment(args):
+    """Start the fixture server and route every external dependency to a local fake."""
+    responses = load_responses()
+    server = FixtureServer(latency=args.http_latency, flaky_rate=args.flaky_rate,
+                           flaky_delay=args.flaky_delay).start()
+
+    translator = type('BenchTranslator', (FakeTranslator,), {
+        'translation': responses['translation'], 'latency': args.translate_latency})
+    tts = type('BenchTTS', (FakeTTS,), {'latency': args.tts_latency})
+
+    try:
+        with patched(utils.genai, 'configure', lambda **kwargs: None), \
+                patched(utils.genai, 'GenerativeModel', lambda name: FakeGeminiModel(responses, args.llm_latency)), \
+                patched(utils, 'GoogleTranslator', translator), \
+                patched(utils.gtts, 'gTTS', tts), \
+                patched(socket, 'getaddrinfo', server.getaddrinfo(socket.getaddrinfo)), \
+                patched(utils.NewsExtractor, 'search_url_template',
+                        server.base_url + "/search?q={query}+news&start={start}"):
+            # In-memory health registry so runs don't learn from (or skew) each other
+            extractor = utils.NewsExtractor('offline-benchmark-key', domain_health=DomainHealthRegistry())
+            extractor.llm_policy = LLMPolicy(mode=args.llm_policy)
+            extractor.request_delay = (0, 0)
+            extractor.page_delay = (0, 0)
+            yield extractor
+    finally:
+        server.stop()
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = (len(ordered) - 1) * pct / 100.0
+    lower = int(index)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (index - lower)
+
+
+def summarize(latencies, wall_seconds, peak_bytes, stage_totals):
+    return {
+        "requests": len(latencies),
+        "p50_seconds": round(percentile(latencies, 50), 4),
+        "p95_seconds": round(percentile(latencies, 95), 4),
+        "p99_seconds": round(percentile(latencies, 99), 4),
+        "max_seconds": round(max(latencies), 4) if latencies else 0.0,
+        "throughput_rps": round(len(latencies) / wall_seconds, 3) if wall_seconds else 0.0,
+        "peak_memory_mb": round(peak_bytes / (1024 * 1024), 3),
+        "stage_seconds": {stage: round(total, 4) for stage, total in sorted(stage_totals.items())},
+    }
+
+
+def run_scenario(name, func, concurrency, iterations, expected_articles=None, count_articles=None):
+    """Run func concurrency*iterations times and collect latency and memory stats.
+
+    With expected_articles, count_articles(result) is checked on every call; a
+    call that returns fewer articles marks the scenario "short", since its
+    latencies then don't measure the full pipeline.
+    """
+    latencies = []
+    article_counts = []
+    stage_totals = {}
+    lock = threading.Lock()
+
+    def one_call():
+        with track_request() as request_metrics:
+            start = time.perf_counter()
+            output = func()
+            elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if count_articles is not None:
+                article_counts.append(count_articles(output))
+            for stage, entry in request_metrics.to_dict()["stages"].items():
+                stage_totals[stage] = stage_totals.get(stage, 0.0) + entry["total_seconds"]
+
+    tracemalloc.reset_peak()
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(one_call) for _ in range(concurrency * iterations)]
+        for future in futures:
+            future.result()
+    wall_seconds = time.perf_counter() - wall_start
+    _, peak = tracemalloc.get_traced_memory()
+
+    result = summarize(latencies, wall_seconds, peak, stage_totals)
+    result["scenario"] = name
+    result["concurrency"] = concurrency
+    if article_counts:
+        result["min_articles"] = min(article_counts)
+        result["short"] = expected_articles is not None and min(article_counts) < expected_articles
+    print(f"{name:<48} c={concurrency:<3} p50={result['p50_seconds']:.3f}s "
+          f"p95={result['p95_seconds']:.3f}s p99={result['p99_seconds']:.3f}s "
+          f"rps={result['throughput_rps']:.2f} peak={result['peak_memory_mb']:.1f}MB"
+          + (f" articles>={result['min_articles']}" if article_counts else ""))
+    if result.get("short"):
+        print(f"  SHORT: expected {expected_articles} articles, got as few as {result['min_articles']}")
+    return result
+
+
+def output_articles(output):
+    return len(output.get("Articles", []))
+
+
+def response_articles(response):
+    return output_articles(json.loads(response.get_data()))
+
+
+def stream_articles(body):
+    result = next((event for event in map(json.loads, body.splitlines()) if event.get("type") == "result"), {})
+    return output_articles(result)
+
+
+def run_benchmarks(args):
+    import api
+
+    results = []
+    company = args.company
+    with offline_environment(args) as extractor:
+        api.extractor = extractor
+        client = api.app.test_client()
+
+        modes = [False, True] if args.speculative else [False]
+        for max_articles in args.max_articles:
+            for concurrency in args.concurrency:
+                for speculative in modes:
+                    results.append(run_scenario(
+                        f"pipeline max_articles={max_articles}" + (" speculative" if speculative else ""),
+                        lambda: extractor.format_data_for_output(
+                            company, extractor.extract_and_analyze(
+                                company, max_articles=max_articles, keep_text=args.keep_text,
+                                speculative=speculative)),
+                        concurrency, args.iterations, max_articles, output_articles))
+
+        # format_data_for_output on its own, with a fixed set of analyzed articles
+        for max_articles in args.max_articles:
+            articles_data = extractor.extract_and_analyze(company, max_articles=max_articles, keep_text=args.keep_text)
+            results.append(run_scenario(
+                f"format_data_for_output articles={len(articles_data)}",
+                lambda: extractor.format_data_for_output(company, articles_data),
+                1, args.iterations, max_articles, output_articles))
+
+        def post(path, payload):
+            response = client.post(path, json=payload)
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+            return response
+
+        for max_articles in args.max_articles:
+            for concurrency in args.concurrency:
+                results.append(run_scenario(
+                    f"POST /api/analyze max_articles={max_articles}",
+                    lambda: post('/api/analyze', {"company_name": company, "max_articles": max_articles,
+                                                  "include_text": args.keep_text}),
+                    concurrency, args.iterations, max_articles, response_articles))
+
+        for max_articles in args.max_articles:
+            results.append(run_scenario(
+                f"POST /api/analyze/stream max_articles={max_articles}",
+                lambda: post('/api/analyze/stream', {"company_name": company, "max_articles": max_articles}).get_data(),
+                1, args.iterations, max_articles, stream_articles))
+
+        analysis_text = load_responses()['gemini_analysis']
+        results.append(run_scenario(
+            "POST /api/translate",
+            lambda: post('/api/translate', {"text": analysis_text}),
+            1, args.iterations))
+        results.append(run_scenario(
+            "POST /api/generate_speech",
+            lambda: post('/api/generate_speech', {"text": analysis_text, "filename": "benchmark.mp3"}),
+            1, args.iterations))
+
+    return results
+
+
+def run_local_analyzer(iterations):
+    """Throughput of the local lexicon pass over the fixture article texts."""
+    texts = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, 'articles', '*.html'))):
+        with open(path, encoding='utf-8') as f:
+            html = f.read()
+        texts.append(' '.join(re.findall(r'<p>(.*?)</p>', html, re.DOTALL)))
+
+    runs = max(1, iterations) * 200
+    start = time.perf_counter()
+    for _ in range(runs):
+        for text in texts:
+            analyze_text(text)
+    elapsed = time.perf_counter() - start
+    articles = runs * len(texts)
+    result = {
+        "scenario": "local analyzer",
+        "concurrency": 1,
+        "articles": articles,
+        "throughput_articles_per_second": round(articles / elapsed, 1),
+        "mean_microseconds": round(elapsed / articles * 1e6, 1),
+    }
+    print(f"{'local analyzer':<48} c=1   {result['mean_microseconds']:.0f}us/article "
+          f"({result['throughput_articles_per_second']:.0f} articles/s)")
+    return result
+
+
+def local_llm_agreement():
+    agree = registry.get_counter("pipeline_events_total", event="local_llm_agree")
+    disagree = registry.get_counter("pipeline_events_total", event="local_llm_disagree")
+    skipped = registry.get_counter("pipeline_events_total", event="llm_skipped_local")
+    compared = agree + disagree
+    return {
+        "compared": compared,
+        "agreement_rate": round(agree / compared, 3) if compared else None,
+        "llm_calls_skipped": skipped,
+    }
+
+
+def prompt_token_stats():
+    return {
+        "estimated_input_tokens": registry.get_counter("prompt_tokens_total"),
+        "tokens_saved": registry.get_counter("prompt_tokens_saved_total"),
+    }
+
+
+def latest_results_file():
+    files = sorted(glob.glob(os.path.join(RESULTS_DIR, '*.json')))
+    return files[-1] if files else None
+
+
+def compare(results, previous_path):
+    with open(previous_path, encoding='utf-8') as f:
+        previous = {(r["scenario"], r["concurrency"]): r for r in json.load(f)["results"]}
+
+    print(f"\nComparison against {previous_path}:")
+    for result in results:
+        old = previous.get((result["scenario"], result["concurrency"]))
+        if not old or "p50_seconds" not in result:
+            continue
+        deltas = []
+        for key in ("p50_seconds", "p95_seconds", "peak_memory_mb"):
+            if old[key]:
+                deltas.append(f"{key}={100.0 * (result[key] - old[key]) / old[key]:+.1f}%")
+        print(f"{result['scenario']:<48} c={result['concurrency']:<3} " + " ".join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark for the news analysis pipeline")
+    parser.add_argument('--company', default='Acme')
+    parser.add_argument('--max-articles', type=int, nargs='+', default=[5, 10])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--iterations', type=int, default=3, help="Requests per worker in each scenario")
+    parser.add_argument('--http-latency', type=float, default=0.0, help="Seconds added to each fixture page")
+    parser.add_argument('--llm-latency', type=float, default=0.0, help="Seconds added to each Gemini call")
+    parser.add_argument('--translate-latency', type=float, default=0.0)
+    parser.add_argument('--flaky-rate', type=float, default=0.0, help="Share of article pages that stall before answering")
+    parser.add_argument('--flaky-delay', type=float, default=2.0, help="Seconds a flaky article page stalls")
+    parser.add_argument('--speculative', action='store_true',
+                        help="Also run the pipeline scenarios with speculative extraction")
+    parser.add_argument('--tts-latency', type=float, default=0.0)
+    parser.add_argument('--llm-policy', choices=LLMPolicy.MODES, default='always',
+                        help="Which articles get a (fake) Gemini call after the local pass")
+    parser.add_argument('--keep-text', action='store_true', help="Keep article text on records (measures its memory cost)")
+    parser.add_argument('--compare', help="Previous results file to compare against (defaults to the latest run)")
+    parser.add_argument('--no-save', action='store_true', help="Do not write results to bench_results/")
+    args = parser.parse_args()
+
+    previous_path = args.compare or latest_results_file()
+
+    tracemalloc.start()
+    results = run_benchmarks(args)
+    tracemalloc.stop()
+    results.append(run_local_analyzer(args.iterations))
+
+    agreement = local_llm_agreement()
+    prompt_tokens = prompt_token_stats()
+    print(f"Prompt tokens: {prompt_tokens['estimated_input_tokens']} sent (estimated), "
+          f"{prompt_tokens['tokens_saved']} trimmed by the prompt builder")
+    print(f"\nLocal vs Gemini sentiment: {agreement['compared']} compared, "
+          f"agreement={agreement['agreement_rate']}, LLM calls skipped={agreement['llm_calls_skipped']}")
+
+    if previous_path:
+        compare(results, previous_path)
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        timestamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        out_path = os.path.join(RESULTS_DIR, f"{timestamp}.json")
+        with open(out_path, 'w', encoding='utf-8') as f:
+            json.dump({"timestamp": timestamp, "args": vars(args), "results": results,
+                       "local_llm_agreement": agreement, "prompt_tokens": prompt_tokens}, f, indent=2)
+        print(f"\nSaved results to {out_path}")
+
+    short = [result["scenario"] for result in results if result.get("short")]
+    if short:
+        print(f"\n{len(short)} scenario(s) returned fewer articles than requested: {', '.join(short)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import profiling
+
+# Worker pool for stages that cannot be interrupted in place (newspaper parsing, Gemini calls).
+# A timed-out call keeps running in its worker but its result is discarded.
+# Sized for several concurrent requests each running speculative extractions (up to 8 stages at once).
+_stage_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='stage')
+
+
+class StageTimeout(Exception):
+    """Raised when a pipeline stage exceeds its timeout or the request deadline.
+
+    `ran` is how long the call actually ran before it was abandoned; it is less
+    than `timeout` when the call first waited for a free worker.
+    """
+
+    def __init__(self, stage, timeout, ran=None):
+        super().__init__(f"{stage} timed out after {timeout:.1f}s")
+        self.stage = stage
+        self.timeout = timeout
+        self.ran = timeout if ran is None else ran
+
+
+class Deadline:
+    """Overall time budget for one analysis request."""
+
+    def __init__(self, budget_seconds=None):
+        self.budget_seconds = budget_seconds
+        self.started = time.monotonic()
+        self.expires_at = self.started + budget_seconds if budget_seconds is not None else None
+        # Set once any work had to be dropped or cut short because of the budget
+        self.exhausted = False
+
+    def remaining(self):
+        """Seconds left in the budget, or None when unbounded."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def expired(self, reserve=0.0):
+        """True when less than `reserve` seconds are left; marks the deadline as exhausted."""
+        remaining = self.remaining()
+        if remaining is not None and remaining <= reserve:
+            self.exhausted = True
+            return True
+        return False
+
+    def timeout_for(self, stage_timeout):
+        """Effective timeout for a stage: its own limit capped by the remaining budget."""
+        remaining = self.remaining()
+        if remaining is None:
+            return stage_timeout
+        if stage_timeout is None:
+            return remaining
+        return min(stage_timeout, remaining)
+
+    def sleep(self, seconds, cancel=None):
+        """Sleep without overrunning the budget; a set `cancel` event wakes it early."""
+        remaining = self.remaining()
+        if remaining is not None:
+            seconds = min(seconds, remaining)
+        if seconds > 0:
+            if cancel is not None:
+                cancel.wait(seconds)
+            else:
+                time.sleep(seconds)
+
+    def to_dict(self):
+        return {
+            "budget_seconds": self.budget_seconds,
+            "elapsed_seconds": round(self.elapsed(), 3),
+            "exhausted": self.exhausted,
+        }
+
+
+def run_with_timeout(stage, timeout, func, *args, **kwargs):
+    """Run func in the stage pool, raising StageTimeout if it takes longer than timeout."""
+    if timeout is None:
+        return func(*args, **kwargs)
+    if timeout <= 0:
+        raise StageTimeout(stage, 0.0, ran=0.0)
+
+    started = []
+
+    def call():
+        started.append(time.monotonic())
+        return func(*args, **kwargs)
+
+    # Carry the caller's context (per-request metrics, profiling) into the worker thread
+    context = contextvars.copy_context()
+    session = profiling.active()
+    if session is not None:
+        # cProfile only sees its own thread; profile the worker's share of the request too
+        future = _stage_executor.submit(context.run, session.run, call)
+    else:
+        future = _stage_executor.submit(context.run, call)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        ran = time.monotonic() - started[0] if started else 0.0
+        raise StageTimeout(stage, timeout, ran=ran)
@@ -0,0 +1,225 @@
+import ipaddress
+import logging
+import socket
+import threading
+import time
+
+import dns.exception
+import dns.resolver
+
+from metrics import count
+
+logger = logging.getLogger(__name__)
+
+# Keep the original so the cache can fall back to (and be uninstalled back to) the system resolver
+_system_getaddrinfo = socket.getaddrinfo
+
+
+class DNSCache:
+    """Thread-safe, TTL-respecting DNS cache with negative caching.
+
+    Lookups go to the configured nameservers through dnspython. Names they don't
+    know (NXDOMAIN, no records) are retried with the system resolver, which also
+    sees /etc/hosts, search domains and internal DNS. If the nameservers cannot be
+    reached, the system resolver is used for `unreachable_ttl` seconds before they
+    are tried again, so a blocked port 53 costs one timeout rather than one per
+    lookup; its answers are cached for `fallback_ttl`. Names that neither knows
+    are remembered for `negative_ttl` seconds. At most `max_entries` hosts are
+    kept; when full, expired entries go first, then the least recently stored.
+    """
+
+    def __init__(self, nameservers=None, min_ttl=30, max_ttl=3600, negative_ttl=60, lifetime=5.0,
+                 fallback_ttl=300, unreachable_ttl=300, max_entries=10000):
+        self.resolver = dns.resolver.Resolver(configure=nameservers is None)
+        if nameservers:
+            self.resolver.nameservers = list(nameservers)
+        self.resolver.lifetime = lifetime
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.fallback_ttl = fallback_ttl
+        self.unreachable_ttl = unreachable_ttl
+        self.max_entries = max_entries
+        # Until when the nameservers are considered unreachable (monotonic time)
+        self._unreachable_until = 0.0
+        self._lock = threading.Lock()
+        self._entries = {}
+        # Locks of the lookups in progress, one per host; removed when the lookup finishes
+        self._host_locks = {}
+        self.stats = {'hits': 0, 'misses': 0, 'negative_hits': 0, 'system_fallbacks': 0, 'errors': 0,
+                      'evictions': 0}
+
+    def _bump(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _cached(self, host):
+        with self._lock:
+            entry = self._entries.get(host)
+            if entry and entry[0] > time.monotonic():
+                return entry
+            return None
+
+    def _store(self, host, addresses, ttl):
+        ttl = max(self.min_ttl, min(self.max_ttl, ttl))
+        self._put(host, addresses, ttl)
+
+    def _put(self, host, addresses, ttl):
+        now = time.monotonic()
+        with self._lock:
+            # Re-insert so dict order is store order and eviction drops the stalest host
+            self._entries.pop(host, None)
+            if len(self._entries) >= self.max_entries:
+                self._prune(now)
+            self._entries[host] = (now + ttl, addresses)
+
+    def _prune(self, now):
+        """Drop expired entries, then the oldest ones, down to 90% of max_entries; _lock must be held."""
+        before = len(self._entries)
+        self._entries = {h: e for h, e in self._entries.items() if e[0] > now}
+        excess = len(self._entries) - int(self.max_entries * 0.9)
+        for host in list(self._entries)[:max(0, excess)]:
+            del self._entries[host]
+        self.stats['evictions'] += before - len(self._entries)
+
+    def resolve(self, host):
+        """Return a list of IP addresses for host, or raise socket.gaierror."""
+        host = host.lower().rstrip('.')
+        entry = self._cached(host)
+        if entry is None:
+            # One lookup per host at a time; concurrent callers wait and reuse the answer
+            with self._lock:
+                host_lock = self._host_locks.setdefault(host, threading.Lock())
+            try:
+                with host_lock:
+                    entry = self._cached(host)
+                    if entry is None:
+                        self._bump('misses')
+                        count("dns_cache_miss")
+                        return self._lookup(host)
+            finally:
+                # Callers still waiting hold their own reference and will find the cached answer
+                with self._lock:
+                    if self._host_locks.get(host) is host_lock:
+                        del self._host_locks[host]
+
+        addresses = entry[1]
+        if addresses is None:
+            self._bump('negative_hits')
+            count("dns_cache_negative_hit")
+            raise socket.gaierror(socket.EAI_NONAME, f"Name or service not known (cached): {host}")
+        self._bump('hits')
+        count("dns_cache_hit")
+        return addresses
+
+    def _lookup(self, host):
+        if time.monotonic() < self._unreachable_until:
+            return self._system_lookup(host)
+
+        for record_type in ('A', 'AAAA'):
+            try:
+                answer = self.resolver.resolve(host, record_type)
+                addresses = [rdata.address for rdata in answer]
+                self._store(host, addresses, answer.rrset.ttl)
+                return addresses
+            except dns.resolver.NoAnswer:
+                continue
+            except dns.resolver.NXDOMAIN:
+                break
+            except (dns.exception.Timeout, OSError) as e:
+                # Nameservers unreachable (e.g. port 53 blocked); stop trying them for a while
+                logger.warning("DNS nameservers unreachable, using system resolver for %ds: %s",
+                               self.unreachable_ttl, e)
+                self._unreachable_until = time.monotonic() + self.unreachable_ttl
+                count("dns_nameservers_unreachable")
+                return self._system_lookup(host)
+            except dns.exception.DNSException as e:
+                logger.debug("DNS lookup via resolver failed host=%s: %s", host, e)
+                return self._system_lookup(host)
+
+        # Unknown to the public nameservers; /etc/hosts, search domains or internal DNS may still know it
+        return self._system_lookup(host)
+
+    def _system_lookup(self, host):
+        self._bump('system_fallbacks')
+        try:
+            infos = _system_getaddrinfo(host, None, 0, socket.SOCK_STREAM)
+        except socket.gaierror:
+            self._bump('errors')
+            self._put(host, None, self.negative_ttl)
+            raise
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        self._store(host, addresses, self.fallback_ttl)
+        return addresses
+
+    def clear(self, negative_only=False):
+        with self._lock:
+            if negative_only:
+                self._entries = {h: e for h, e in self._entries.items() if e[1] is not None}
+            else:
+                self._entries.clear()
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            stats = dict(self.stats)
+            entries = {
+                host: {'addresses': addresses, 'ttl_remaining': round(expires - now, 1)}
+                for host, (expires, addresses) in self._entries.items() if expires > now
+            }
+        lookups = stats['hits'] + stats['negative_hits'] + stats['misses']
+        stats['lookups_saved'] = stats['hits'] + stats['negative_hits']
+        stats['hit_rate'] = round(stats['lookups_saved'] / lookups, 3) if lookups else 0.0
+        return {'stats': stats, 'entries': entries}
+
+
+_cache = None
+_install_lock = threading.Lock()
+
+
+def _is_ip_literal(host):
+    try:
+        ipaddress.ip_address(host.split('%')[0])
+        return True
+    except ValueError:
+        return False
+
+
+def _cached_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+    """Drop-in socket.getaddrinfo that resolves host names through the DNS cache."""
+    if (_cache is None or not host or flags & socket.AI_NUMERICHOST
+            or isinstance(host, bytes) or host == 'localhost' or _is_ip_literal(host)):
+        return _system_getaddrinfo(host, port, family, type, proto, flags)
+
+    results = []
+    for address in _cache.resolve(host):
+        try:
+            results.extend(_system_getaddrinfo(address, port, family, type, proto, flags | socket.AI_NUMERICHOST))
+        except socket.gaierror:
+            # Address family not wanted by the caller (e.g. IPv6 for AF_INET)
+            continue
+    if not results:
+        raise socket.gaierror(socket.EAI_NONAME, f"No usable address for {host}")
+    return results
+
+
+def install(nameservers=None, **kwargs):
+    """Install the process-wide DNS cache; every socket connection (requests, newspaper) then uses it."""
+    global _cache
+    with _install_lock:
+        if _cache is None:
+            _cache = DNSCache(nameservers=nameservers, **kwargs)
+            socket.getaddrinfo = _cached_getaddrinfo
+            logger.info("Installed DNS cache nameservers=%s", nameservers or "system")
+        return _cache
+
+
+def uninstall():
+    global _cache
+    with _install_lock:
+        socket.getaddrinfo = _system_getaddrinfo
+        _cache = None
+
+
+def get_cache():
+    return _cache
@@ -0,0 +1,210 @@
+import json
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def domain_of(url):
+    """Normalized host for a URL, without a leading www."""
+    domain = urlparse(url).netloc.lower().split(':')[0]
+    return domain[4:] if domain.startswith('www.') else domain
+
+
+class DomainStats:
+    """Rolling download health for one news domain."""
+
+    def __init__(self, data=None):
+        data = data or {}
+        self.attempts = data.get('attempts', 0)
+        self.failures = data.get('failures', 0)
+        self.empty = data.get('empty', 0)
+        # Exponentially weighted averages so old behaviour fades out
+        self.avg_latency = data.get('avg_latency')
+        self.failure_rate = data.get('failure_rate', 0.0)
+        self.empty_rate = data.get('empty_rate', 0.0)
+        self.consecutive_failures = data.get('consecutive_failures', 0)
+        self.state = data.get('state', CLOSED)
+        self.opened_at = data.get('opened_at')
+        self.open_count = data.get('open_count', 0)
+        self.last_seen = data.get('last_seen')
+
+    def to_dict(self):
+        return {
+            'attempts': self.attempts,
+            'failures': self.failures,
+            'empty': self.empty,
+            'avg_latency': round(self.avg_latency, 3) if self.avg_latency is not None else None,
+            'failure_rate': round(self.failure_rate, 3),
+            'empty_rate': round(self.empty_rate, 3),
+            'consecutive_failures': self.consecutive_failures,
+            'state': self.state,
+            'opened_at': self.opened_at,
+            'open_count': self.open_count,
+            'last_seen': self.last_seen,
+        }
+
+
+class DomainHealthRegistry:
+    """Per-domain download health with a circuit breaker, persisted to a local JSON file.
+
+    A domain's circuit opens after repeated failures (or a high failure/empty-text
+    rate); while open it is skipped. After `open_seconds` one probe request is let
+    through (half-open): success closes the circuit, failure re-opens it with a
+    longer wait.
+    """
+
+    def __init__(self, path=None, alpha=0.3, failure_threshold=3, failure_rate_threshold=0.6,
+                 min_attempts=5, open_seconds=600, max_open_seconds=6 * 3600, slow_seconds=8.0,
+                 save_interval=30):
+        self.path = path
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_attempts = min_attempts
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.slow_seconds = slow_seconds
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        # Serializes writes to the file; held across the disk I/O, which _lock must not be
+        self._save_lock = threading.Lock()
+        self._domains = {}
+        self._probing = set()
+        self._last_save = 0.0
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            self._domains = {domain: DomainStats(stats) for domain, stats in data.items()}
+            logger.info("Loaded domain health domains=%d path=%s", len(self._domains), self.path)
+        except (OSError, ValueError) as e:
+            logger.warning("Could not load domain health from %s: %s", self.path, e)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._save_lock:
+            with self._lock:
+                data = {domain: stats.to_dict() for domain, stats in self._domains.items()}
+                self._last_save = time.time()
+            try:
+                tmp_path = self.path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=2, sort_keys=True)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning("Could not save domain health to %s: %s", self.path, e)
+
+    def _maybe_save(self):
+        # Claim the save under the lock so concurrent record() calls don't all write
+        with self._lock:
+            due = time.time() - self._last_save >= self.save_interval
+            if due:
+                self._last_save = time.time()
+        if due:
+            self.save()
+
+    def _open_duration(self, stats):
+        # Back off exponentially for domains that keep failing their probes
+        return min(self.open_seconds * (2 ** max(0, stats.open_count - 1)), self.max_open_seconds)
+
+    def allow(self, url):
+        """Whether a download from this URL's domain should be attempted now."""
+        domain = domain_of(url)
+        with self._lock:
+            stats = self._domains.get(domain)
+            if stats is None or stats.state == CLOSED:
+                return True
+            if stats.state == OPEN:
+                if time.time() - stats.opened_at < self._open_duration(stats):
+                    return False
+                stats.state = HALF_OPEN
+            # Half-open: a single probe at a time
+            if domain in self._probing:
+                return False
+            self._probing.add(domain)
+            return True
+
+    def release(self, url):
+        """Give back a half-open probe slot taken by allow() when no outcome will be recorded for it."""
+        with self._lock:
+            self._probing.discard(domain_of(url))
+
+    def record(self, url, latency, success, empty=False):
+        """Record the outcome of one download attempt."""
+        domain = domain_of(url)
+        failed = not success or empty
+        with self._lock:
+            stats = self._domains.setdefault(domain, DomainStats())
+            stats.attempts += 1
+            stats.failures += 0 if success else 1
+            stats.empty += 1 if success and empty else 0
+            stats.last_seen = time.time()
+            if stats.avg_latency is None:
+                stats.avg_latency = latency
+            else:
+                stats.avg_latency += self.alpha * (latency - stats.avg_latency)
+            stats.failure_rate += self.alpha * ((0.0 if success else 1.0) - stats.failure_rate)
+            stats.empty_rate += self.alpha * ((1.0 if success and empty else 0.0) - stats.empty_rate)
+            stats.consecutive_failures = stats.consecutive_failures + 1 if failed else 0
+
+            was_probe = domain in self._probing
+            self._probing.discard(domain)
+
+            if not failed and stats.state != CLOSED:
+                logger.info("Closing circuit for domain=%s", domain)
+                stats.state = CLOSED
+                stats.open_count = 0
+            elif failed and (was_probe or self._should_open(stats)) and stats.state != OPEN:
+                stats.state = OPEN
+                stats.opened_at = time.time()
+                stats.open_count += 1
+                logger.warning("Opening circuit for domain=%s for %ds", domain, self._open_duration(stats))
+        self._maybe_save()
+
+    def _should_open(self, stats):
+        if stats.consecutive_failures >= self.failure_threshold:
+            return True
+        if stats.attempts >= self.min_attempts:
+            return stats.failure_rate + stats.empty_rate >= self.failure_rate_threshold
+        return False
+
+    def priority(self, url):
+        """Sort key for search results: healthy, fast domains first (lower is better)."""
+        with self._lock:
+            stats = self._domains.get(domain_of(url))
+            if stats is None:
+                return 0.0
+            penalty = stats.failure_rate + stats.empty_rate
+            if stats.avg_latency is not None and stats.avg_latency > self.slow_seconds:
+                penalty += stats.avg_latency / self.slow_seconds
+            return penalty
+
+    def snapshot(self, domain=None):
+        with self._lock:
+            if domain is not None:
+                stats = self._domains.get(domain)
+                return stats.to_dict() if stats else None
+            return {name: stats.to_dict() for name, stats in sorted(self._domains.items())}
+
+    def reset(self, domain=None):
+        with self._lock:
+            if domain is None:
+                self._domains.clear()
+                self._probing.clear()
+            else:
+                self._domains.pop(domain, None)
+                self._probing.discard(domain)
+        self.save()
@@ -0,0 +1,139 @@
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import count, add_total
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Article download limits
+MAX_REDIRECTS = 5
+MAX_ARTICLE_BYTES = 2 * 1024 * 1024
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+_CHUNK_SIZE = 64 * 1024
+_CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([a-zA-Z0-9_\-]+)', re.IGNORECASE)
+
+_local = threading.local()
+
+
+def get_session():
+    """Per-thread requests.Session with keep-alive connection pooling.
+
+    Sessions are not guaranteed thread-safe, so each worker thread gets its own;
+    all of them resolve through the process-wide DNS cache.
+    """
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        session.headers.update(DEFAULT_HEADERS)
+        session.max_redirects = MAX_REDIRECTS
+        adapter = HTTPAdapter(pool_connections=20, pool_maxsize=20)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _local.session = session
+    return session
+
+
+class DownloadRejected(Exception):
+    """Raised when a URL is not worth parsing as an article (wrong type, too many redirects, ...)."""
+
+    def __init__(self, reason, url, detail=""):
+        super().__init__(f"{reason}: {url} {detail}".strip())
+        self.reason = reason
+        self.url = url
+
+
+class _DownloadTiming:
+    """Running average of accepted article download times, to estimate time saved by early rejects."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.average = None
+
+    def record(self, seconds):
+        with self._lock:
+            self.average = seconds if self.average is None else self.average + 0.2 * (seconds - self.average)
+
+
+_timing = _DownloadTiming()
+
+
+def _reject(reason, url, started, detail="", bytes_avoided=0):
+    count(f"download_rejected_{reason}")
+    if bytes_avoided:
+        add_total("download_bytes_avoided_total", bytes_avoided)
+    if _timing.average is not None:
+        saved = _timing.average - (time.monotonic() - started)
+        if saved > 0:
+            add_total("download_saved_milliseconds_total", int(saved * 1000))
+    raise DownloadRejected(reason, url, detail)
+
+
+def _decode(body, response):
+    content_type = response.headers.get('Content-Type', '')
+    if 'charset=' in content_type.lower() and response.encoding:
+        encoding = response.encoding
+    else:
+        match = _CHARSET_RE.search(body[:4096])
+        encoding = match.group(1).decode('ascii') if match else 'utf-8'
+    try:
+        return body.decode(encoding, errors='replace')
+    except LookupError:
+        return body.decode('utf-8', errors='replace')
+
+
+def fetch_article_html(url, timeout=10, max_bytes=MAX_ARTICLE_BYTES, cancel=None):
+    """Download an article page, checking headers before reading the body.
+
+    Streams the response and gives up early on non-HTML content, oversized
+    bodies and redirect loops, so only plausible article pages reach the parser.
+    Bodies longer than max_bytes are cut off there; the article text is
+    almost always well within the first couple of megabytes.
+
+    A set `cancel` event (threading.Event) stops the download between chunks.
+    """
+    started = time.monotonic()
+    try:
+        response = get_session().get(url, timeout=timeout, stream=True)
+    except requests.exceptions.TooManyRedirects:
+        _reject("redirects", url, started)
+
+    with response:
+        response.raise_for_status()
+
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        declared_length = int(response.headers.get('Content-Length') or 0)
+        if content_type and content_type not in HTML_CONTENT_TYPES:
+            _reject("content_type", url, started, content_type, declared_length)
+        if declared_length > max_bytes * 4:
+            # Far too big to be an article page; don't read any of it
+            _reject("too_large", url, started, f"{declared_length} bytes", declared_length)
+
+        chunks = []
+        received = 0
+        for chunk in response.iter_content(_CHUNK_SIZE):
+            if cancel is not None and cancel.is_set():
+                count("download_cancelled")
+                raise DownloadRejected("cancelled", url)
+            if not chunks and not content_type:
+                # No declared type: sniff the first bytes instead
+                head = chunk[:1024].lstrip().lower()
+                if not (head.startswith(b'<') or b'<html' in head):
+                    _reject("content_type", url, started, "not html", declared_length)
+            chunks.append(chunk)
+            received += len(chunk)
+            if received >= max_bytes:
+                count("download_truncated")
+                break
+
+    body = b''.join(chunks)[:max_bytes]
+    add_total("download_bytes_total", len(body))
+    if declared_length > len(body):
+        add_total("download_bytes_avoided_total", declared_length - len(body))
+    _timing.record(time.monotonic() - started)
+    return _decode(body, response)
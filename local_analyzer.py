@@ -0,0 +1,204 @@
+import os
+import re
+import time
+
+import numpy as np
+
+from metrics import count, registry
+
+# Word-level sentiment weights for business news, in [-1, 1]
+SENTIMENT_LEXICON = {
+    # positive
+    'beat': 0.6, 'beats': 0.6, 'surge': 0.7, 'surged': 0.7, 'surges': 0.7, 'soar': 0.8, 'soared': 0.8,
+    'soars': 0.8, 'jump': 0.5, 'jumped': 0.5, 'jumps': 0.5, 'gain': 0.5, 'gains': 0.5, 'gained': 0.5,
+    'rise': 0.4, 'rises': 0.4, 'rose': 0.4, 'rally': 0.6, 'rallied': 0.6, 'growth': 0.5, 'grow': 0.4,
+    'grew': 0.4, 'growing': 0.4, 'profit': 0.5, 'profits': 0.5, 'profitable': 0.6, 'record': 0.4,
+    'strong': 0.5, 'stronger': 0.5, 'strength': 0.4, 'robust': 0.5, 'upbeat': 0.6, 'optimistic': 0.6,
+    'optimism': 0.6, 'outperform': 0.6, 'outperformed': 0.6, 'upgrade': 0.6, 'upgraded': 0.6,
+    'raised': 0.3, 'raises': 0.3, 'boost': 0.5, 'boosted': 0.5, 'boosts': 0.5, 'improve': 0.4,
+    'improved': 0.4, 'improving': 0.4, 'improvement': 0.4, 'success': 0.6, 'successful': 0.6,
+    'win': 0.5, 'wins': 0.5, 'won': 0.5, 'partnership': 0.3, 'expand': 0.4, 'expands': 0.4,
+    'expansion': 0.4, 'innovative': 0.5, 'innovation': 0.4, 'launch': 0.3, 'launches': 0.3,
+    'launched': 0.3, 'exceed': 0.5, 'exceeded': 0.5, 'exceeds': 0.5, 'positive': 0.5,
+    'momentum': 0.4, 'demand': 0.2, 'buyback': 0.4, 'dividend': 0.3, 'breakthrough': 0.7,
+    'approval': 0.5, 'approved': 0.5, 'recovery': 0.4, 'rebound': 0.5, 'rebounded': 0.5,
+    # negative
+    'miss': -0.6, 'missed': -0.6, 'misses': -0.6, 'fall': -0.4, 'falls': -0.4, 'fell': -0.4,
+    'drop': -0.5, 'dropped': -0.5, 'drops': -0.5, 'decline': -0.5, 'declined': -0.5, 'declines': -0.5,
+    'plunge': -0.8, 'plunged': -0.8, 'plunges': -0.8, 'slump': -0.7, 'slumped': -0.7, 'tumble': -0.7,
+    'tumbled': -0.7, 'loss': -0.5, 'losses': -0.5, 'lose': -0.4, 'lost': -0.4, 'weak': -0.5,
+    'weaker': -0.5, 'weakness': -0.5, 'cut': -0.4, 'cuts': -0.4, 'layoff': -0.7, 'layoffs': -0.7,
+    'downgrade': -0.6, 'downgraded': -0.6, 'lawsuit': -0.6, 'sued': -0.6, 'probe': -0.5,
+    'investigation': -0.5, 'fine': -0.4, 'fined': -0.6, 'penalty': -0.5, 'fraud': -0.9,
+    'scandal': -0.8, 'bankruptcy': -0.9, 'bankrupt': -0.9, 'default': -0.7, 'recall': -0.6,
+    'recalls': -0.6, 'warning': -0.5, 'warns': -0.5, 'warned': -0.5, 'risk': -0.3, 'risks': -0.3,
+    'concern': -0.4, 'concerns': -0.4, 'crisis': -0.8, 'disruption': -0.5, 'delay': -0.4,
+    'delayed': -0.4, 'delays': -0.4, 'shortage': -0.5, 'struggle': -0.5, 'struggling': -0.5,
+    'pessimistic': -0.6, 'criticised': -0.5, 'criticized': -0.5, 'antitrust': -0.4, 'breach': -0.6,
+    'hack': -0.7, 'outage': -0.6, 'resign': -0.4, 'resigns': -0.4, 'resigned': -0.4, 'negative': -0.5,
+    'volatile': -0.3, 'volatility': -0.3, 'uncertainty': -0.4, 'slowdown': -0.5, 'downturn': -0.6,
+}
+
+NEGATORS = {'not', 'no', 'never', 'without', 'nor', 'cannot'}
+
+# Terms that make an article "high impact": worth an LLM read even when the lexicon is confident
+HIGH_IMPACT_TERMS = {
+    'acquisition', 'acquire', 'acquires', 'merger', 'bankruptcy', 'lawsuit', 'fraud', 'investigation',
+    'probe', 'antitrust', 'recall', 'layoffs', 'resigns', 'resigned', 'guidance', 'earnings',
+    'default', 'scandal', 'breach', 'sanctions', 'ipo',
+}
+
+KEYWORD_STOPWORDS = {'about', 'after', 'also', 'been', 'from', 'have', 'more', 'most', 'other', 'said', 'some', 'that', 'their', 'them', 'then', 'there', 'these', 'they', 'this', 'were', 'what', 'when', 'which', 'with', 'would'}
+
+_TOKEN_RE = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+# Lexicon as parallel arrays: token -> index into _WEIGHTS, index 0 is "no sentiment"
+_INDEX = {word: i + 1 for i, word in enumerate(SENTIMENT_LEXICON)}
+_WEIGHTS = np.concatenate([[0.0], np.fromiter(SENTIMENT_LEXICON.values(), dtype=np.float64)])
+
+
+def extract_keywords(text, num_keywords=5):
+    """Extract keywords using frequency analysis."""
+    # Simple keyword extraction based on frequency
+    words = re.findall(r'\b[a-zA-Z]{4,}\b', text.lower())
+    filtered_words = [w for w in words if w not in KEYWORD_STOPWORDS]
+
+    # Count word frequency
+    word_counts = {}
+    for word in filtered_words:
+        if word in word_counts:
+            word_counts[word] += 1
+        else:
+            word_counts[word] = 1
+
+    # Get top keywords
+    sorted_words = sorted(word_counts.items(), key=lambda x: x[1], reverse=True)
+    return [word for word, count in sorted_words[:num_keywords]]
+
+
+class LocalAnalysis:
+    """Result of the local lexicon pass over one article."""
+
+    __slots__ = ('sentiment', 'sentiment_score', 'keywords', 'confidence', 'high_impact', 'hits')
+
+    def __init__(self, sentiment, sentiment_score, keywords, confidence, high_impact, hits):
+        self.sentiment = sentiment
+        self.sentiment_score = sentiment_score
+        self.keywords = keywords
+        self.confidence = confidence
+        self.high_impact = high_impact
+        self.hits = hits
+
+
+def score_sentiment(tokens):
+    """Lexicon sentiment for a token list: (score in [-1, 1], number of sentiment words)."""
+    if not tokens:
+        return 0.0, 0
+    ids = np.fromiter((_INDEX.get(t, 0) for t in tokens), dtype=np.int64, count=len(tokens))
+    weights = _WEIGHTS[ids]
+    hits = int(np.count_nonzero(ids))
+    if not hits:
+        return 0.0, 0
+
+    # A negator flips the polarity of the sentiment words in the next two tokens
+    negated = np.fromiter((t in NEGATORS or t.endswith("n't") for t in tokens), dtype=bool, count=len(tokens))
+    flip = np.zeros(len(tokens), dtype=bool)
+    for offset in (1, 2):
+        flip[offset:] |= negated[:-offset]
+    weights = np.where(flip, -weights, weights)
+
+    # Dampen by length so long articles don't saturate, then squash into [-1, 1]
+    score = float(np.tanh(weights.sum() / np.sqrt(hits + 4)))
+    return score, hits
+
+
+def analyze_text(text, num_keywords=5, neutral_band=0.15):
+    """Sentiment, keywords and impact for an article without any network calls."""
+    start = time.perf_counter()
+    tokens = _TOKEN_RE.findall(text.lower())
+    score, hits = score_sentiment(tokens)
+
+    if score > neutral_band:
+        sentiment = "positive"
+    elif score < -neutral_band:
+        sentiment = "negative"
+    else:
+        sentiment = "neutral"
+
+    # Confidence grows with both the strength of the score and the evidence behind it
+    confidence = abs(score) * min(1.0, hits / 8.0)
+    high_impact = not HIGH_IMPACT_TERMS.isdisjoint(tokens)
+
+    result = LocalAnalysis(
+        sentiment=sentiment,
+        sentiment_score=round(score, 3),
+        keywords=extract_keywords(text, num_keywords),
+        confidence=round(confidence, 3),
+        high_impact=high_impact,
+        hits=hits,
+    )
+    registry.observe("local_analysis_seconds", time.perf_counter() - start)
+    return result
+
+
+class LLMPolicy:
+    """Decides which articles go to Gemini after the local pass.
+
+    mode:
+        "always" - every article goes to the LLM (local result is only the fallback)
+        "tiered" - only ambiguous (low confidence) or high-impact articles go to the LLM
+        "local"  - no per-article LLM calls at all
+    """
+
+    MODES = ("always", "tiered", "local")
+
+    def __init__(self, mode="always", min_confidence=0.25, send_high_impact=True, max_llm_articles=None):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown LLM policy {mode!r}; expected one of {', '.join(self.MODES)}")
+        self.mode = mode
+        self.min_confidence = min_confidence
+        self.send_high_impact = send_high_impact
+        self.max_llm_articles = max_llm_articles
+
+    @classmethod
+    def from_env(cls):
+        max_llm = os.environ.get('LLM_POLICY_MAX_ARTICLES')
+        return cls(
+            mode=os.environ.get('LLM_POLICY', 'always'),
+            min_confidence=float(os.environ.get('LLM_POLICY_MIN_CONFIDENCE', 0.25)),
+            max_llm_articles=int(max_llm) if max_llm else None,
+        )
+
+    def with_mode(self, mode):
+        """Copy of this policy with only the mode changed, e.g. for a per-request override."""
+        return LLMPolicy(mode=mode, min_confidence=self.min_confidence,
+                         send_high_impact=self.send_high_impact, max_llm_articles=self.max_llm_articles)
+
+    def needs_llm(self, local, llm_calls_so_far=0):
+        if self.mode == "local":
+            return False
+        if self.max_llm_articles is not None and llm_calls_so_far >= self.max_llm_articles:
+            return False
+        if self.mode == "always":
+            return True
+        if self.send_high_impact and local.high_impact:
+            return True
+        return local.confidence < self.min_confidence
+
+
+def record_agreement(local, llm_sentiment, llm_score):
+    """Track how often the local pass agrees with Gemini on articles that got both."""
+    if llm_sentiment == local.sentiment:
+        count("local_llm_agree")
+    else:
+        count("local_llm_disagree")
+    try:
+        registry.observe("local_llm_score_diff", abs(float(llm_score) - local.sentiment_score))
+    except (TypeError, ValueError):
+        pass
+
+
+# The lexicon pass takes tens to hundreds of microseconds, below the smallest default bucket
+registry.describe("local_analysis_seconds", "Time spent in the local lexicon sentiment pass per article.",
+                  buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05))
+registry.describe("local_llm_score_diff", "Absolute difference between local and Gemini sentiment scores.")
@@ -0,0 +1,202 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Histogram buckets (seconds) shared by all pipeline stage timings
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_request = ContextVar('current_request_metrics', default=None)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(label_key, extra=None):
+    items = list(label_key)
+    if extra:
+        items.extend(extra)
+    if not items:
+        return ""
+    parts = []
+    for key, value in items:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class Histogram:
+    """Cumulative histogram with fixed buckets."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+
+
+class MetricsRegistry:
+    """Thread-safe process-wide counters and histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._buckets = {}
+
+    def describe(self, name, help_text, buckets=None):
+        """Set a metric's help text and, for histograms, its buckets when DEFAULT_BUCKETS don't fit."""
+        self._help[name] = help_text
+        if buckets is not None:
+            self._buckets[name] = tuple(buckets)
+
+    def inc(self, name, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self._buckets.get(name, DEFAULT_BUCKETS))
+            histogram.observe(value)
+
+    def get_counter(self, name, **labels):
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name in sorted(self._counters):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(self._counters[name].items()):
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+
+            for name in sorted(self._histograms):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in sorted(self._histograms[name].items()):
+                    for bound, bucket_count in zip(histogram.buckets, histogram.bucket_counts):
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {bucket_count}")
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+class RequestMetrics:
+    """Stage timings and counters collected for a single analysis request."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+
+    def add_timing(self, stage, seconds):
+        with self._lock:
+            entry = self.stages.setdefault(stage, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            entry["count"] += 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+
+    def add_count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "total_seconds": round(time.perf_counter() - self.started, 4),
+                "stages": {
+                    stage: {
+                        "count": entry["count"],
+                        "total_seconds": round(entry["total_seconds"], 4),
+                        "max_seconds": round(entry["max_seconds"], 4),
+                    }
+                    for stage, entry in self.stages.items()
+                },
+                "counters": dict(self.counters),
+            }
+
+
+registry = MetricsRegistry()
+registry.describe("pipeline_stage_seconds", "Time spent in each pipeline stage.")
+registry.describe("pipeline_events_total", "Pipeline events such as retries, failures, cache hits and skipped sites.")
+registry.describe("analysis_requests_total", "Completed company analysis requests.")
+registry.describe("download_bytes_total", "Article body bytes downloaded.")
+registry.describe("download_bytes_avoided_total", "Article body bytes not downloaded because the page was rejected or truncated.")
+registry.describe("prompt_tokens_total", "Estimated Gemini prompt input tokens sent.")
+registry.describe("prompt_tokens_saved_total", "Estimated prompt tokens saved against the untrimmed prompts.")
+registry.describe("download_saved_milliseconds_total", "Estimated download time saved by rejecting pages early.")
+
+
+@contextmanager
+def track_request():
+    """Collect per-request metrics for the duration of the block."""
+    request_metrics = RequestMetrics()
+    token = _current_request.set(request_metrics)
+    try:
+        yield request_metrics
+    finally:
+        _current_request.reset(token)
+
+
+def current_request():
+    return _current_request.get()
+
+
+@contextmanager
+def timed(stage):
+    """Time a pipeline stage into the aggregate histogram and the current request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        registry.observe("pipeline_stage_seconds", elapsed, stage=stage)
+        request_metrics = _current_request.get()
+        if request_metrics is not None:
+            request_metrics.add_timing(stage, elapsed)
+
+
+def count(event, amount=1):
+    """Count a pipeline event in the aggregate counters and the current request."""
+    registry.inc("pipeline_events_total", amount, event=event)
+    request_metrics = _current_request.get()
+    if request_metrics is not None:
+        request_metrics.add_count(event, amount)
+
+
+def add_total(name, amount):
+    """Add a quantity (bytes, milliseconds, tokens) to its own counter and the current request.
+
+    Unlike count(), these are not events, so they stay out of pipeline_events_total.
+    """
+    registry.inc(name, amount)
+    request_metrics = _current_request.get()
+    if request_metrics is not None:
+        request_metrics.add_count(name, amount)
@@ -0,0 +1,217 @@
+import cProfile
+import hmac
+import io
+import marshal
+import os
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from metrics import count
+
+# Fraction of /api/analyze requests profiled (CPU only) without being asked; 0 disables sampling
+SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+# Profiling requests and the profile endpoints need a matching X-Profile-Token header; both are off while it is unset
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN') or None
+# Finished profiles kept in memory, oldest dropped first
+MAX_STORED = int(os.environ.get('PROFILE_MAX_STORED', '20'))
+
+TOP_N = 40
+TRACEMALLOC_FRAMES = 1
+
+_active = ContextVar('active_profile', default=None)
+# tracemalloc is process-wide and newer Pythons allow one cProfile at a time, so profile one request at a time
+_busy = threading.Lock()
+
+
+class ProfileSession:
+    """cProfile (and optionally tracemalloc) data for one request.
+
+    The request thread is profiled directly; stage workers add their own
+    profiles through run(), since cProfile only sees the thread it runs on.
+    """
+
+    def __init__(self, label, memory):
+        self.profile_id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.memory = memory
+        self.started = time.time()
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Profile the calling thread until the returned profiler is passed to stop(); None if unavailable."""
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active on this interpreter
+            return None
+        return profiler
+
+    def stop(self, profiler):
+        if profiler is None:
+            return
+        profiler.disable()
+        with self._lock:
+            self._profiles.append(profiler)
+
+    def run(self, func, *args, **kwargs):
+        profiler = self.start()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.stop(profiler)
+
+    def stats(self):
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            return None
+        stats = pstats.Stats(profiles[0])
+        for profiler in profiles[1:]:
+            stats.add(profiler)
+        return stats
+
+
+def requested(headers, args):
+    """Profiling mode for a request: "full" when asked for, "sampled" by PROFILE_SAMPLE_RATE, else None."""
+    if headers.get('X-Profile', '').lower() in ('1', 'true', 'yes') or args.get('profile') == '1':
+        if authorized(headers):
+            return "full"
+        count("profile_unauthorized")
+    if SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+def authorized(headers):
+    """True for a request carrying the configured PROFILE_TOKEN; always False when none is configured."""
+    return PROFILE_TOKEN is not None and hmac.compare_digest(headers.get('X-Profile-Token', ''), PROFILE_TOKEN)
+
+
+def active():
+    """The profile session of the current request, if it is being profiled."""
+    return _active.get()
+
+
+@contextmanager
+def profile_request(label, mode):
+    """Profile the block when mode is set; yields the ProfileSession, or None when not profiling.
+
+    "full" adds tracemalloc allocation tracking to cProfile; "sampled" is CPU
+    only, to keep continuous profiling cheap.
+    """
+    if mode is None or not _busy.acquire(blocking=False):
+        if mode is not None:
+            count("profile_skipped_busy")
+        yield None
+        return
+
+    session = ProfileSession(label, memory=(mode == "full"))
+    token = _active.set(session)
+    started_tracemalloc = session.memory and not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    profiler = session.start()
+    try:
+        yield session
+    finally:
+        session.stop(profiler)
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        snapshot = peak = None
+        if started_tracemalloc:
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        _active.reset(token)
+        _busy.release()
+        store.add(_build_report(session, mode, wall, cpu, snapshot, peak))
+        count(f"profile_{mode}")
+
+
+def _build_report(session, mode, wall, cpu, snapshot, peak):
+    report = {
+        "id": session.profile_id,
+        "label": session.label,
+        "mode": mode,
+        "started": session.started,
+        "wall_seconds": round(wall, 3),
+        # Process CPU time across all threads; wall time well above it means the request mostly waited on I/O
+        "cpu_seconds": round(cpu, 3),
+        "functions": [],
+        "allocations": [],
+    }
+    stats = session.stats()
+    if stats is not None:
+        report["functions"] = _top_functions(stats)
+        text = io.StringIO()
+        stats.stream = text
+        stats.sort_stats('cumulative').print_stats(TOP_N)
+        report["text"] = text.getvalue()
+        # Same format as Stats.dump_stats, so it loads in pstats/snakeviz
+        report["pstats"] = marshal.dumps(stats.stats)
+    if snapshot is not None:
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        report["peak_traced_bytes"] = peak
+        report["allocations"] = [
+            {"site": str(stat.traceback[0]), "size_bytes": stat.size, "count": stat.count}
+            for stat in snapshot.statistics('lineno')[:TOP_N]
+        ]
+    return report
+
+
+def _top_functions(stats):
+    rows = []
+    for (filename, line, name), (calls, primitive, own, cumulative, _) in stats.stats.items():
+        rows.append({
+            "function": f"{os.path.basename(filename)}:{line}({name})",
+            "calls": calls,
+            "own_seconds": round(own, 4),
+            "cumulative_seconds": round(cumulative, 4),
+        })
+    rows.sort(key=lambda row: row["cumulative_seconds"], reverse=True)
+    return rows[:TOP_N]
+
+
+class ProfileStore:
+    """The most recent MAX_STORED profile reports, by id."""
+
+    def __init__(self, max_items=MAX_STORED):
+        self.max_items = max_items
+        self._reports = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, report):
+        with self._lock:
+            self._reports[report["id"]] = report
+            while len(self._reports) > self.max_items:
+                self._reports.popitem(last=False)
+
+    def get(self, profile_id):
+        with self._lock:
+            return self._reports.get(profile_id)
+
+    def summaries(self):
+        with self._lock:
+            reports = list(self._reports.values())
+        return [
+            {key: report.get(key) for key in ("id", "label", "mode", "started", "wall_seconds", "cpu_seconds",
+                                              "peak_traced_bytes")}
+            for report in reversed(reports)
+        ]
+
+
+store = ProfileStore()
@@ -0,0 +1,190 @@
+import math
+import re
+
+from local_analyzer import HIGH_IMPACT_TERMS
+from metrics import add_total
+
+# Whole lines of site furniture: they start with a menu/footer phrase ("Subscribe to our
+# newsletter", "© 2024 Reuters") or end in a credit ("... | Getty Images"). Words like
+# "copyright" or "sign up" inside a sentence are article content and are not matched.
+BOILERPLATE_PATTERNS = re.compile(
+    r'^(subscribe|sign up|sign in|log in|we use cookies|advertisement|sponsored|read more|click here|'
+    r'follow us|share this|related articles|most read|recommended for you|terms of (use|service)|'
+    r'privacy policy|all rights reserved|copyright\s*(©|\d{4})|©)\b'
+    r'|(all rights reserved|getty images|reuters staff)\W*$',
+    re.IGNORECASE
+)
+# Furniture lines are short; anything longer is kept whatever it starts with
+BOILERPLATE_MAX_CHARS = 120
+
+# Latin-script sentence ends, plus the Devanagari danda used in Hindi text
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9"\'“])|(?<=[।॥])\s*')
+_NUMBER = re.compile(r'(\$|€|£|₹)\s?\d|\d+(\.\d+)?\s?(%|percent|billion|million|bn|m\b)|\b\d{2,}\b')
+_WORD = re.compile(r'[a-z]+')
+# Amounts that make a line article content: money, percentages, millions, 4,000
+_FIGURE = re.compile(r'(\$|€|£|₹)\s?\d|\d+(\.\d+)?\s?(%|percent|billion|million|bn\b)|\b\d{1,3}(,\d{3})+\b')
+
+
+def estimate_tokens(text):
+    """Rough token count for Gemini prompts (about four characters per token)."""
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def strip_boilerplate(text, company_name=None):
+    """Drop navigation, subscription and other non-article lines, plus exact duplicates.
+
+    Lines that mention the company or carry figures are always kept.
+    """
+    terms = company_terms(company_name)
+    kept = []
+    seen = set()
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line in seen:
+            continue
+        lowered = line.lower()
+        if not any(term in lowered for term in terms) and not _FIGURE.search(line):
+            # Short lines without sentence punctuation are usually menus, bylines or captions
+            if len(line) < 40 and not line.endswith(('.', '!', '?', '"', '”')):
+                continue
+            if len(line) <= BOILERPLATE_MAX_CHARS and BOILERPLATE_PATTERNS.search(line):
+                continue
+        seen.add(line)
+        kept.append(line)
+    return '\n'.join(kept)
+
+
+def company_terms(company_name):
+    if not company_name:
+        return []
+    terms = [company_name.lower()]
+    # Also match the first word ("Acme" for "Acme Corp") when it is distinctive enough
+    first = company_name.split()[0].lower()
+    if len(first) > 3 and first not in terms:
+        terms.append(first)
+    return terms
+
+
+def score_sentence(sentence, position, company_terms):
+    """Heuristic information value of one sentence."""
+    lowered = sentence.lower()
+    score = 0.0
+    if any(term in lowered for term in company_terms):
+        score += 3.0
+    if _NUMBER.search(sentence):
+        score += 2.0
+    if not HIGH_IMPACT_TERMS.isdisjoint(_WORD.findall(lowered)):
+        score += 1.0
+    # News leads carry the key facts
+    if position == 0:
+        score += 2.0
+    elif position < 3:
+        score += 1.0
+    if len(sentence) < 40:
+        score -= 1.0
+    return score
+
+
+def select_content(text, company_name=None, token_budget=500):
+    """Pick the highest-value sentences of an article that fit in token_budget.
+
+    Sentences are chosen by score and then put back in their original order so the
+    excerpt still reads as the article did. Text that already fits is sent unchanged.
+    """
+    if estimate_tokens(text) <= token_budget:
+        return text
+    cleaned = strip_boilerplate(text, company_name) or text
+    if estimate_tokens(cleaned) <= token_budget:
+        return cleaned
+
+    sentences = [s.strip() for s in _SENTENCE_SPLIT.split(cleaned.replace('\n', ' ')) if s.strip()]
+    terms = company_terms(company_name)
+    ranked = sorted(
+        range(len(sentences)),
+        key=lambda i: (-score_sentence(sentences[i], i, terms), i)
+    )
+
+    chosen = []
+    used = 0
+    for i in ranked:
+        cost = estimate_tokens(sentences[i]) + 1
+        if used + cost > token_budget:
+            continue
+        chosen.append(i)
+        used += cost
+    if not chosen:
+        # No sentence fits on its own (unpunctuated text, one huge sentence); send a prefix instead
+        return cleaned[:token_budget * 4]
+    return ' '.join(sentences[i] for i in sorted(chosen))
+
+
+# What the prompts sent before the builder existed: the first 2000 characters of each
+# article, and the full summaries of the first 7 articles. Savings are measured against these.
+BASELINE_ARTICLE_CHARS = 2000
+BASELINE_ANALYSIS_ARTICLES = 7
+
+ARTICLE_PROMPT = """Analyze this article and provide four outputs:
+
+1. SUMMARY: Summarize this article in 3-4 sentences.
+2. TOPICS: Extract 5 key topics (single words or short phrases) from this article. List only the topics separated by commas.
+3. SENTIMENT: Analyze the sentiment of the article (positive, negative, neutral). Only provide 1 word
+4. SENTIMENT_SCORE: Provide a sentiment score between -1 and 1, where -1 is very negative, 0 is neutral, and 1 is very positive.
+
+Format your response as:
+SUMMARY: [your summary here]
+TOPICS: [topic1, topic2, topic3, topic4, topic5]
+SENTIMENT: [positive/negative/neutral]
+SENTIMENT_SCORE: [score]
+
+Article text:
+{content}
+"""
+
+ANALYSIS_PROMPT = """You are analyzing news about {company_name}. Based on these article summaries, identify the key trends, sentiment, and business implications.
+Keep your analysis concise but insightful, focusing on what these news items reveal about the company's current situation and potential future. keep it 1-2 lines long only.
+
+Article summaries:
+"""
+
+
+def build_article_prompt(text, company_name=None, token_budget=300):
+    """Combined summary/topics/sentiment prompt for one article, sized to token_budget."""
+    content = select_content(text, company_name, token_budget)
+    prompt = ARTICLE_PROMPT.format(content=content)
+    _record_prompt(prompt, estimate_tokens(text[:BASELINE_ARTICLE_CHARS]) - estimate_tokens(content))
+    return prompt
+
+
+def build_analysis_prompt(company_name, formatted_articles, token_budget=600,
+                          max_articles=BASELINE_ANALYSIS_ARTICLES):
+    """Company-level analysis prompt over article summaries, sized to token_budget.
+
+    Each article gets an equal share of the budget; summaries longer than their
+    share are cut down to their most informative sentences.
+    """
+    prompt = ANALYSIS_PROMPT.format(company_name=company_name)
+    articles = formatted_articles[:max_articles]
+    if not articles:
+        return prompt
+
+    per_article = max(40, (token_budget - estimate_tokens(prompt)) // len(articles))
+    baseline = prompt
+    for i, article in enumerate(formatted_articles[:BASELINE_ANALYSIS_ARTICLES]):
+        baseline += f"\nArticle {i+1}: {article['Title']}. {article['Summary'] or ''}\n"
+    for i, article in enumerate(articles):
+        header = f"Article {i+1}: {article['Title']}."
+        summary = article['Summary'] or ""
+        summary_budget = per_article - estimate_tokens(header)
+        if estimate_tokens(summary) > summary_budget:
+            summary = select_content(summary, company_name, max(summary_budget, 20))
+        prompt += f"\n{header} {summary}\n"
+
+    _record_prompt(prompt, estimate_tokens(baseline) - estimate_tokens(prompt))
+    return prompt
+
+
+def _record_prompt(prompt, tokens_saved):
+    """Count estimated prompt tokens, and tokens saved against the baseline prompt (never negative)."""
+    add_total("prompt_tokens_total", estimate_tokens(prompt))
+    if tokens_saved > 0:
+        add_total("prompt_tokens_saved_total", tokens_saved)
@@ -0,0 +1,148 @@
+import re
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+
+from metrics import count
+
+# "24h", "7d", "2w", "3m", "1y" -> Google's qdr unit and the length of one unit
+_UNITS = {
+    'h': ('h', timedelta(hours=1)),
+    'd': ('d', timedelta(days=1)),
+    'w': ('w', timedelta(weeks=1)),
+    'm': ('m', timedelta(days=30)),
+    'y': ('y', timedelta(days=365)),
+}
+_RELATIVE_SPEC = re.compile(r'^\s*(\d+)\s*([hdwmy])\s*$', re.IGNORECASE)
+
+# Ages as Google prints them in news results: "3 hours ago", "1 day ago", "2 weeks ago"
+_AGO = re.compile(r'(\d+)\s+(min|mins|minute|minutes|hour|hours|day|days|week|weeks|month|months|year|years)\s+ago',
+                  re.IGNORECASE)
+_AGO_UNITS = {
+    'min': timedelta(minutes=1), 'hour': timedelta(hours=1), 'day': timedelta(days=1),
+    'week': timedelta(weeks=1), 'month': timedelta(days=30), 'year': timedelta(days=365),
+}
+# Absolute dates: "Mar 5, 2024" and "5 Mar 2024"
+_MONTHS = 'jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec'
+_MONTH_FIRST = re.compile(rf'({_MONTHS})[a-z]*\.?\s+(\d{{1,2}}),?\s+(\d{{4}})', re.IGNORECASE)
+_DAY_FIRST = re.compile(rf'(\d{{1,2}})\s+({_MONTHS})[a-z]*\.?,?\s+(\d{{4}})', re.IGNORECASE)
+# Google separates the date from the source and snippet with a middle dot
+_SEGMENT_SEPARATOR = re.compile(r'\s*[·•|]\s*')
+
+
+class TimeWindow:
+    """Only articles published at or after `cutoff` (UTC) are wanted."""
+
+    __slots__ = ('cutoff', 'search_param', 'spec')
+
+    def __init__(self, cutoff, search_param, spec):
+        self.cutoff = cutoff
+        self.search_param = search_param
+        self.spec = spec
+
+    def is_stale(self, published):
+        """True when `published` is known and older than the window; unknown dates are kept."""
+        if published is None:
+            return False
+        return as_utc(published) < self.cutoff
+
+    def to_dict(self):
+        return {'since': self.spec, 'cutoff': self.cutoff.isoformat()}
+
+
+def as_utc(value):
+    """Timezone-aware UTC datetime; naive datetimes (e.g. from newspaper) are taken as UTC."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def parse_since(value, now=None):
+    """TimeWindow from a `since` value, or None when no window was asked for.
+
+    Accepts a relative window ("24h", "7d", "2w", "3m", "1y"), a number of days,
+    or an ISO date/datetime ("2024-03-01"). Raises ValueError for anything else.
+    """
+    if value is None or value == '':
+        return None
+    now = now or datetime.now(timezone.utc)
+
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = f"{int(value)}d"
+    if not isinstance(value, str):
+        raise ValueError("since must be a string like '7d' or an ISO date")
+
+    match = _RELATIVE_SPEC.match(value)
+    if match:
+        amount = int(match.group(1))
+        if amount <= 0:
+            raise ValueError("since must be a positive window")
+        unit, length = _UNITS[match.group(2).lower()]
+        return TimeWindow(now - amount * length, f"qdr:{unit}{amount}", value.strip())
+
+    try:
+        cutoff = as_utc(datetime.fromisoformat(value.strip()))
+    except ValueError:
+        raise ValueError(f"Invalid since value: {value!r}; use e.g. '24h', '7d', '1m' or '2024-03-01'")
+    if cutoff > now:
+        raise ValueError("since must not be in the future")
+    # Custom date range search; Google wants M/D/YYYY
+    return TimeWindow(cutoff, f"cdr:1,cd_min:{cutoff.month}/{cutoff.day}/{cutoff.year}", value.strip())
+
+
+def snippet_date(pieces, now=None):
+    """Publication date shown with a search result, or None if there isn't one.
+
+    `pieces` are the result's text elements (e.g. BeautifulSoup's
+    stripped_strings). Only a piece, or a "·"-separated part of one, that is
+    nothing but a date counts; dates inside snippet sentences ("revenue doubled
+    from 3 years ago") are ignored. When several qualify, the last one wins.
+    """
+    if isinstance(pieces, str):
+        pieces = [pieces]
+    now = now or datetime.now(timezone.utc)
+
+    found = None
+    for piece in pieces:
+        for segment in _SEGMENT_SEPARATOR.split(piece.strip()):
+            date = _parse_date(segment, now)
+            if date is not None:
+                found = date
+    return found
+
+
+def _parse_date(segment, now):
+    match = _AGO.fullmatch(segment)
+    if match:
+        unit = match.group(2).lower().rstrip('s')
+        unit = 'min' if unit.startswith('min') else unit
+        return now - int(match.group(1)) * _AGO_UNITS[unit]
+
+    for pattern, month_group, day_group in ((_MONTH_FIRST, 1, 2), (_DAY_FIRST, 2, 1)):
+        match = pattern.fullmatch(segment)
+        if match:
+            try:
+                month = datetime.strptime(match.group(month_group)[:3].title(), '%b').month
+                return datetime(int(match.group(3)), month, int(match.group(day_group)), tzinfo=timezone.utc)
+            except ValueError:
+                return None
+    return None
+
+
+def last_modified(session, url, timeout):
+    """Last-Modified of a URL from a HEAD request, or None when unavailable.
+
+    Dynamic pages usually report the time of the request, so this can only
+    prove a page is old, never that it is new.
+    """
+    try:
+        response = session.head(url, timeout=timeout, allow_redirects=True)
+    except Exception:
+        count("head_check_failure")
+        return None
+    header = response.headers.get('Last-Modified')
+    if not header:
+        return None
+    try:
+        return as_utc(parsedate_to_datetime(header))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,41 @@
+class ArticleRecord:
+    """Analyzed article as it moves through the pipeline.
+
+    Slotted to keep per-article overhead small; the article text is only kept when
+    the caller asks for it, everything else is the compact analysis result.
+    """
+
+    __slots__ = ('title', 'url', 'summary', 'topics', 'sentiment', 'sentiment_score', 'publish_date', 'text',
+                 'analysis_source')
+
+    def __init__(self, title, url, summary, topics, sentiment, sentiment_score, publish_date=None, text=None,
+                 analysis_source="llm"):
+        self.title = title
+        self.url = url
+        self.summary = summary
+        self.topics = topics
+        self.sentiment = sentiment
+        self.sentiment_score = sentiment_score
+        self.publish_date = publish_date
+        self.text = text
+        # "llm" when Gemini analyzed the article, "local" when only the lexicon pass did
+        self.analysis_source = analysis_source
+
+    def __repr__(self):
+        return f"ArticleRecord(title={self.title!r}, url={self.url!r}, sentiment={self.sentiment!r})"
+
+    def to_output(self):
+        """Article entry in the API response format."""
+        output = {
+            "Title": self.title,
+            "URL": self.url,
+            "sentiment": self.sentiment,
+            "sentiment_score": self.sentiment_score,
+            "Summary": self.summary,
+            "Topics": self.topics,
+            "Publish Date": str(self.publish_date) if self.publish_date else "Unknown",
+            "analysis_source": self.analysis_source
+        }
+        if self.text is not None:
+            output["Text"] = self.text
+        return output
@@ -0,0 +1,123 @@
+import gzip
+import json
+
+from flask import Response, request
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed; compression would not pay for itself
+MIN_COMPRESS_BYTES = 1024
+
+# Article-level field names accepted by `fields`, mapped to the response keys
+ARTICLE_FIELDS = {
+    'title': 'Title',
+    'url': 'URL',
+    'sentiment': 'sentiment',
+    'sentiment_score': 'sentiment_score',
+    'summary': 'Summary',
+    'topics': 'Topics',
+    'publish_date': 'Publish Date',
+    'analysis_source': 'analysis_source',
+    'text': 'Text',
+}
+
+
+def dumps(data):
+    """Serialize to compact JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, default=str, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def parse_fields(value):
+    """`fields` from a request (list or comma-separated string) as a set of lower-case names.
+
+    Raises ValueError for anything else, including lists with non-string entries.
+    """
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, list) or not all(isinstance(field, str) for field in value):
+        raise ValueError("fields must be a comma-separated string or a list of field names")
+    return {field.strip().lower() for field in value if field.strip()}
+
+
+def project(output, fields):
+    """Keep only the requested fields of an analysis output.
+
+    Top-level keys are matched case-insensitively ("comparison", "llm analysis");
+    article-level names ("title", "sentiment_score", "topics", ...) trim each entry
+    in Articles. "Company" is always kept.
+    """
+    if not fields:
+        return output
+
+    article_keys = [key for name, key in ARTICLE_FIELDS.items() if name in fields]
+    projected = {}
+    for key, value in output.items():
+        lowered = key.lower()
+        if key == "Company" or lowered in fields:
+            projected[key] = value
+        elif key == "Articles" and article_keys:
+            projected[key] = [
+                {k: article[k] for k in article_keys if k in article}
+                for article in value
+            ]
+    return projected
+
+
+def choose_encoding(accept_encoding):
+    """Pick br or gzip from an Accept-Encoding header, honouring q=0."""
+    offered = {}
+    for part in (accept_encoding or '').split(','):
+        pieces = part.strip().split(';')
+        name = pieces[0].strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in pieces[1:]:
+            param = param.strip()
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        offered[name] = quality
+
+    for encoding in ('br', 'gzip'):
+        if encoding == 'br' and brotli is None:
+            continue
+        if offered.get(encoding, offered.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+
+def json_response(data, status=200):
+    """JSON response serialized with the fast path and compressed when the client accepts it."""
+    body = dumps(data)
+    response = Response(status=status, mimetype='application/json')
+    response.headers['Vary'] = 'Accept-Encoding'
+
+    encoding = choose_encoding(request.headers.get('Accept-Encoding')) if len(body) >= MIN_COMPRESS_BYTES else None
+    if encoding:
+        body = compress(body, encoding)
+        response.headers['Content-Encoding'] = encoding
+    response.set_data(body)
+    return response
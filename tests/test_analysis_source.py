@@ -0,0 +1,29 @@
+import pytest
+
+newspaper = pytest.importorskip("newspaper")
+
+from local_analyzer import analyze_text  # noqa: E402
+from utils import NewsExtractor  # noqa: E402
+
+TEXT = "Acme Corp reported record profits and strong growth this quarter. Shares rallied on the news."
+
+
+def extractor_answering(response):
+    extractor = NewsExtractor.__new__(NewsExtractor)
+    extractor.article_prompt_tokens = 300
+    extractor.query_gemini = lambda prompt, max_tokens, **kwargs: response
+    return extractor
+
+
+def test_gemini_sentiment_is_marked_llm():
+    extractor = extractor_answering(
+        "SUMMARY: Acme beat estimates.\nTOPICS: earnings\nSENTIMENT: positive\nSENTIMENT_SCORE: 0.8")
+    *_, sentiment, score, source = extractor.extract_topics_and_summary_combined(TEXT, local=analyze_text(TEXT))
+    assert (sentiment, score, source) == ("positive", 0.8, "llm")
+
+
+def test_local_fallback_sentiment_is_marked_local():
+    local = analyze_text(TEXT)
+    extractor = extractor_answering("Error: quota exceeded")
+    *_, sentiment, score, source = extractor.extract_topics_and_summary_combined(TEXT, local=local)
+    assert (sentiment, score, source) == (local.sentiment, local.sentiment_score, "local")
@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+
+import pytest
+
+import api
+from local_analyzer import LLMPolicy
+
+
+@pytest.fixture
+def parse(monkeypatch):
+    policy = LLMPolicy("tiered", send_high_impact=False, max_llm_articles=3)
+    monkeypatch.setattr(api, 'extractor', SimpleNamespace(default_budget=240, speculative=False, llm_policy=policy))
+
+    def parse(data):
+        with api.app.test_request_context():
+            return api.parse_analyze_options(data)
+    return parse
+
+
+@pytest.mark.parametrize("timeout", [0, -5, "0", "nan", "inf"])
+def test_non_positive_timeout_is_rejected(parse, timeout):
+    options, error = parse({"company_name": "Acme", "timeout_seconds": timeout})
+    assert options is None
+    assert error[1] == 400
+
+
+def test_timeout_defaults_to_the_extractor_budget(parse):
+    options, error = parse({"company_name": "Acme"})
+    assert error is None
+    assert options["timeout_seconds"] == 240
+
+
+def test_request_policy_keeps_the_configured_cap(parse):
+    options, error = parse({"company_name": "Acme", "llm_policy": "always"})
+    assert error is None
+    policy = options["llm_policy"]
+    assert policy.mode == "always"
+    assert policy.max_llm_articles == 3
+    assert policy.send_high_impact is False
+
+
+def test_unknown_policy_is_rejected(parse):
+    options, error = parse({"company_name": "Acme", "llm_policy": "unlimited"})
+    assert options is None
+    assert error[1] == 400
+
+
+def test_non_string_fields_are_rejected(parse):
+    options, error = parse({"company_name": "Acme", "fields": [1]})
+    assert options is None
+    assert error[1] == 400
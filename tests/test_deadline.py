@@ -0,0 +1,28 @@
+import time
+
+import pytest
+
+from deadline import Deadline, StageTimeout, run_with_timeout
+
+
+def test_stage_timeout_reports_how_long_the_call_ran():
+    with pytest.raises(StageTimeout) as excinfo:
+        run_with_timeout("parse", 0.1, time.sleep, 0.5)
+    assert excinfo.value.stage == "parse"
+    assert 0.05 < excinfo.value.ran <= 0.2
+
+
+def test_run_with_timeout_returns_result():
+    assert run_with_timeout("parse", 1.0, lambda x: x * 2, 21) == 42
+
+
+def test_unbounded_deadline_never_expires():
+    deadline = Deadline()
+    assert deadline.remaining() is None
+    assert not deadline.expired(reserve=1000)
+
+
+def test_zero_budget_is_already_expired():
+    deadline = Deadline(0)
+    assert deadline.remaining() == 0.0
+    assert deadline.expired()
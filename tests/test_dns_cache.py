@@ -0,0 +1,80 @@
+import socket
+import time
+
+import pytest
+
+pytest.importorskip("dns.resolver")
+
+import dns.exception
+import dns.resolver
+
+import dns_cache
+from dns_cache import DNSCache
+
+
+class FailingResolver:
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    def resolve(self, host, record_type):
+        self.calls += 1
+        raise self.error
+
+
+def system_answer(address):
+    def fake(host, port, family=0, type=0, proto=0, flags=0):
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', (address, 0))]
+    return fake
+
+
+def test_nxdomain_falls_back_to_system_resolver(monkeypatch):
+    cache = DNSCache(nameservers=['192.0.2.1'])
+    cache.resolver = FailingResolver(dns.resolver.NXDOMAIN())
+    monkeypatch.setattr(dns_cache, '_system_getaddrinfo', system_answer('10.0.0.7'))
+
+    assert cache.resolve('internal-service') == ['10.0.0.7']
+    assert cache.snapshot()['stats']['system_fallbacks'] == 1
+
+
+def test_unreachable_nameservers_are_skipped_after_first_timeout(monkeypatch):
+    cache = DNSCache(nameservers=['192.0.2.1'])
+    cache.resolver = FailingResolver(dns.exception.Timeout())
+    monkeypatch.setattr(dns_cache, '_system_getaddrinfo', system_answer('10.0.0.8'))
+
+    assert cache.resolve('a.example') == ['10.0.0.8']
+    assert cache.resolve('b.example') == ['10.0.0.8']
+    assert cache.resolver.calls == 1
+
+
+class Answer:
+    def __init__(self, address, ttl):
+        self.rrset = type('RRset', (), {'ttl': ttl})()
+        self._rdata = [type('Rdata', (), {'address': address})()]
+
+    def __iter__(self):
+        return iter(self._rdata)
+
+
+class StaticResolver:
+    def resolve(self, host, record_type):
+        return Answer('10.0.0.9', 60)
+
+
+def test_cache_is_bounded_and_drops_expired_entries():
+    cache = DNSCache(nameservers=['192.0.2.1'], max_entries=10)
+    cache.resolver = StaticResolver()
+    for i in range(25):
+        cache.resolve(f'host{i}.example')
+
+    assert len(cache._entries) <= 10
+    assert 'host24.example' in cache._entries
+    assert 'host0.example' not in cache._entries
+    assert cache._host_locks == {}
+
+    # Expired entries are removed before live ones when the cache fills up
+    for host in list(cache._entries)[-3:]:
+        cache._entries[host] = (0.0, ['10.0.0.9'])
+    live = [host for host in cache._entries if cache._entries[host][0] > 0]
+    cache._prune(time.monotonic())
+    assert sorted(cache._entries) == sorted(live)
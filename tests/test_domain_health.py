@@ -0,0 +1,65 @@
+import json
+import os
+import threading
+import time
+
+from domain_health import DomainHealthRegistry
+
+URL = "https://news.example.com/story"
+
+
+def open_circuit(registry):
+    for _ in range(registry.failure_threshold):
+        registry.allow(URL)
+        registry.record(URL, 1.0, success=False)
+
+
+def test_released_probe_can_be_taken_again():
+    registry = DomainHealthRegistry(open_seconds=0)
+    open_circuit(registry)
+
+    assert registry.allow(URL)          # half-open: takes the single probe
+    assert not registry.allow(URL)      # probe already out
+    registry.release(URL)               # skipped without a download
+    assert registry.allow(URL)
+
+
+def test_probe_success_closes_circuit():
+    registry = DomainHealthRegistry(open_seconds=0)
+    open_circuit(registry)
+
+    assert registry.allow(URL)
+    registry.record(URL, 0.5, success=True)
+    assert registry.snapshot("news.example.com")["state"] == "closed"
+
+
+def test_concurrent_saves_do_not_overlap(tmp_path, monkeypatch):
+    path = str(tmp_path / "domain_health.json")
+    registry = DomainHealthRegistry(path, save_interval=0)
+    active = []
+    overlaps = []
+    real_dump = json.dump
+
+    def slow_dump(data, f, **kwargs):
+        active.append(f)
+        overlaps.append(len(active))
+        time.sleep(0.005)
+        real_dump(data, f, **kwargs)
+        active.remove(f)
+    monkeypatch.setattr(json, 'dump', slow_dump)
+
+    def record_many(n):
+        for i in range(5):
+            registry.record(f"https://site{n}-{i}.example.com/story", 0.1, success=True)
+
+    threads = [threading.Thread(target=record_many, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with open(path, encoding='utf-8') as f:
+        saved = json.load(f)
+    assert saved
+    assert max(overlaps) == 1  # one writer of the temp file at a time
+    assert not os.path.exists(path + '.tmp')
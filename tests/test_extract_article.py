@@ -0,0 +1,47 @@
+import pytest
+
+pytest.importorskip("newspaper")
+
+import nltk
+
+try:
+    # newspaper's nlp() step needs the punkt sentence tokenizer data
+    nltk.sent_tokenize("One. Two.")
+except LookupError:
+    pytest.skip("NLTK punkt data is not installed", allow_module_level=True)
+
+import utils
+from benchmark import FixtureServer
+from domain_health import DomainHealthRegistry
+from metrics import track_request
+
+
+@pytest.fixture
+def server():
+    server = FixtureServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def extractor():
+    return utils.NewsExtractor('test-key', domain_health=DomainHealthRegistry())
+
+
+def test_extracts_fixture_article(server, extractor):
+    with track_request() as request_metrics:
+        content = extractor.extract_article_content(server.base_url + "/article/earnings-beat.html")
+
+    assert content['success'], content
+    assert content['rejected'] is None
+    assert "Acme" in content['text']
+    assert content['title']
+    assert request_metrics.counters["download_bytes_total"] > 0
+    assert "extract_failure" not in request_metrics.counters
+
+
+def test_missing_page_is_a_failure_not_a_rejection(server, extractor):
+    content = extractor.extract_article_content(server.base_url + "/article/missing.html")
+
+    assert not content['success']
+    assert content['rejected'] is None
@@ -0,0 +1,12 @@
+from metrics import DEFAULT_BUCKETS, MetricsRegistry
+
+
+def test_described_buckets_are_used_for_a_histogram():
+    registry = MetricsRegistry()
+    registry.describe("fast_seconds", "A fast stage.", buckets=(0.0001, 0.001))
+    registry.observe("fast_seconds", 0.00005)
+    registry.observe("slow_seconds", 0.00005)
+
+    text = registry.render_prometheus()
+    assert 'fast_seconds_bucket{le="0.0001"} 1' in text
+    assert f'slow_seconds_bucket{{le="{DEFAULT_BUCKETS[0]}"}} 1' in text
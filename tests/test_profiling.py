@@ -0,0 +1,18 @@
+import profiling
+
+
+def test_profiling_is_denied_without_a_configured_token(monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILE_TOKEN', None)
+    monkeypatch.setattr(profiling, 'SAMPLE_RATE', 0)
+
+    assert not profiling.authorized({})
+    assert not profiling.authorized({'X-Profile-Token': ''})
+    assert profiling.requested({'X-Profile': '1'}, {}) is None
+
+
+def test_profiling_needs_the_matching_token(monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILE_TOKEN', 'secret')
+    monkeypatch.setattr(profiling, 'SAMPLE_RATE', 0)
+
+    assert not profiling.authorized({'X-Profile-Token': 'wrong'})
+    assert profiling.requested({'X-Profile': '1', 'X-Profile-Token': 'secret'}, {}) == "full"
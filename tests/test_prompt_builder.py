@@ -0,0 +1,52 @@
+from prompt_builder import build_analysis_prompt, estimate_tokens, select_content, strip_boilerplate
+
+
+def test_unpunctuated_text_falls_back_to_prefix():
+    text = "acme " * 600  # one 3000-character "sentence"
+    content = select_content(text, "Acme", token_budget=100)
+    assert content
+    assert estimate_tokens(content) <= 100
+
+
+def test_hindi_text_splits_on_danda():
+    sentences = ["एक्मे ने नई चिप पेश की" * 3 + "।" for _ in range(40)]
+    content = select_content(" ".join(sentences), token_budget=200)
+    assert content
+    assert content.endswith("।")
+    assert estimate_tokens(content) <= 200
+
+
+def test_analysis_prompt_stays_within_budget():
+    articles = [{"Title": f"Acme story {i}", "Summary": "Acme Corp reported strong results. " * 12}
+                for i in range(10)]
+    prompt = build_analysis_prompt("Acme", articles, token_budget=600)
+    assert estimate_tokens(prompt) <= 650
+    assert "Article 7:" in prompt and "Article 8:" not in prompt
+
+
+LEAD = ("Acme Corp faces a copyright lawsuit from a group of authors over its AI training data.\n"
+        "Acme said it will sign up 40 new enterprise customers this year, lifting revenue 12%.\n"
+        "The company's lawyers said the claims were without merit and would be contested.\n")
+FURNITURE = ("Subscribe to our newsletter\n"
+             "Sign up for the morning briefing.\n"
+             "Advertisement\n"
+             "© 2024 Example News. All rights reserved.\n")
+
+
+def test_lead_sentences_mentioning_boilerplate_words_are_kept():
+    body = " ".join(["Analysts had expected a quieter quarter for the business."] * 60)
+    content = select_content(FURNITURE + LEAD + body, "Acme Corp", token_budget=150)
+    assert "copyright lawsuit" in content
+    assert "sign up 40 new enterprise customers" in content
+    assert "Subscribe to our newsletter" not in content
+    assert "All rights reserved" not in content
+
+
+def test_text_within_budget_is_not_stripped():
+    text = FURNITURE + LEAD
+    assert select_content(text, "Acme Corp", token_budget=500) == text
+
+
+def test_furniture_lines_with_company_or_figures_are_kept():
+    cleaned = strip_boilerplate("Read more: Acme cuts 4,000 jobs\nRead more about our coverage\n", "Acme")
+    assert cleaned == "Read more: Acme cuts 4,000 jobs"
@@ -0,0 +1,34 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from recency import parse_since, snippet_date
+
+NOW = datetime(2026, 10, 19, tzinfo=timezone.utc)
+
+
+def test_snippet_date_reads_standalone_date_elements():
+    assert snippet_date(["Acme beats estimates", "Reuters", "2 days ago"], NOW) == datetime(2026, 10, 17, tzinfo=timezone.utc)
+    assert snippet_date(["Mar 5, 2024"], NOW) == datetime(2024, 3, 5, tzinfo=timezone.utc)
+
+
+def test_snippet_date_reads_dot_separated_prefix():
+    assert snippet_date(["3 hours ago · Acme Corp reported earnings."], NOW) == datetime(2026, 10, 18, 21, tzinfo=timezone.utc)
+
+
+def test_snippet_date_ignores_dates_inside_sentences():
+    pieces = ["Acme revenue doubled from 3 years ago, the company said.", "2 hours ago"]
+    assert snippet_date(pieces, NOW) == datetime(2026, 10, 18, 22, tzinfo=timezone.utc)
+    assert snippet_date(["Acme revenue doubled from 3 years ago, the company said."], NOW) is None
+
+
+def test_fresh_result_survives_window():
+    window = parse_since("7d", NOW)
+    pieces = ["Acme revenue doubled from 3 years ago, the company said.", "2 hours ago"]
+    assert not window.is_stale(snippet_date(pieces, NOW))
+
+
+def test_parse_since_rejects_bad_values():
+    for value in ("abc", "0d", "2030-01-01"):
+        with pytest.raises(ValueError):
+            parse_since(value, NOW)
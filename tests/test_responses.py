@@ -0,0 +1,57 @@
+import pytest
+
+import responses
+from responses import choose_encoding, parse_fields, project
+
+OUTPUT = {
+    "Company": "Acme",
+    "Articles": [{"Title": "Acme beats estimates", "URL": "https://example.com/a", "Summary": "...",
+                  "sentiment": "positive", "sentiment_score": 0.8}],
+    "Comparison": {"positive": 1},
+    "LLM Analysis": "Upbeat quarter.",
+}
+
+
+def test_parse_fields_accepts_strings_and_lists():
+    assert parse_fields(" Title, sentiment ,") == {"title", "sentiment"}
+    assert parse_fields(["URL"]) == {"url"}
+    assert parse_fields(None) is None
+
+
+@pytest.mark.parametrize("value", [[1], ["title", None], {"title": 1}, 5])
+def test_parse_fields_rejects_non_string_entries(value):
+    with pytest.raises(ValueError):
+        parse_fields(value)
+
+
+def test_project_trims_articles_and_keeps_company():
+    projected = project(OUTPUT, {"title", "llm analysis"})
+    assert projected == {
+        "Company": "Acme",
+        "Articles": [{"Title": "Acme beats estimates"}],
+        "LLM Analysis": "Upbeat quarter.",
+    }
+
+
+def test_project_without_fields_returns_everything():
+    assert project(OUTPUT, None) is OUTPUT
+
+
+def test_choose_encoding_honours_q_zero(monkeypatch):
+    monkeypatch.setattr(responses, 'brotli', object())
+    assert choose_encoding("gzip, br") == "br"
+    assert choose_encoding("br;q=0, gzip") == "gzip"
+    assert choose_encoding("*;q=0") is None
+    assert choose_encoding("identity") is None
+    assert choose_encoding("br;q=0, *") == "gzip"
+    assert choose_encoding("gzip;q=bogus") is None
+
+
+def test_small_bodies_are_not_compressed(monkeypatch):
+    app = pytest.importorskip("flask").Flask(__name__)
+    with app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+        monkeypatch.setattr(responses, 'brotli', None)
+        small = responses.json_response({"a": 1})
+        large = responses.json_response({"a": "x" * responses.MIN_COMPRESS_BYTES})
+    assert "Content-Encoding" not in small.headers
+    assert large.headers["Content-Encoding"] == "gzip"
@@ -0,0 +1,144 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+pytest.importorskip("newspaper")
+
+from deadline import Deadline  # noqa: E402
+from domain_health import DomainHealthRegistry  # noqa: E402
+import utils  # noqa: E402
+from utils import NewsExtractor  # noqa: E402
+
+
+class ListPool:
+    """CandidatePool stand-in that hands out fixed results in order."""
+
+    def __init__(self, results):
+        self.results = list(results)
+
+    def next(self, wanted):
+        return self.results.pop(0) if self.results else None
+
+
+def make_extractor(workers=4):
+    extractor = NewsExtractor.__new__(NewsExtractor)
+    extractor.speculative_workers = workers
+    extractor.speculative_overprovision = 2
+    extractor.triage_overfetch = 2
+    extractor.final_analysis_reserve = 0
+    extractor.stage_timeouts = {'llm': 5}
+    return extractor
+
+
+def results(n):
+    return [{'url': f"https://site{i}.example.com/story", 'triage_score': 10 - i} for i in range(n)]
+
+
+def run(extractor, process, candidates, max_articles):
+    downloaded, skipped = set(), set()
+    records = extractor._run_speculative(ListPool(candidates), process, max_articles, Deadline(),
+                                         downloaded, skipped)
+    return records, downloaded, skipped
+
+
+def test_results_come_back_in_rank_order():
+    # Lower-ranked candidates finish first
+    def process(result, cancel):
+        rank = int(result['url'][len("https://site")])
+        time.sleep(0.05 * (4 - rank))
+        return "downloaded", rank
+
+    records, downloaded, _ = run(make_extractor(), process, results(4), max_articles=2)
+    assert records == [2, 3]
+
+
+def test_running_work_is_cancelled_once_quota_is_met():
+    second_started = threading.Event()
+    cancelled = []
+
+    def process(result, cancel):
+        if result['url'].startswith("https://site0."):
+            second_started.wait(2)
+            return "downloaded", "first"
+        second_started.set()
+        cancelled.append(cancel.wait(2))
+        return "downloaded", None
+
+    start = time.monotonic()
+    records, _, _ = run(make_extractor(workers=2), process, results(6), max_articles=1)
+    assert records == ["first"]
+    assert time.monotonic() - start < 1
+    for _ in range(100):
+        if cancelled:
+            break
+        time.sleep(0.01)
+    assert cancelled == [True]
+
+
+class ManualExecutor:
+    """Executor that only runs the first submission; the rest stay queued."""
+
+    instances = []
+
+    def __init__(self, max_workers=None, thread_name_prefix=''):
+        self.futures = []
+        ManualExecutor.instances.append(self)
+
+    def submit(self, func, *args):
+        future = Future()
+        if not self.futures:
+            future.set_result(func(*args))
+        self.futures.append(future)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        if cancel_futures:
+            for future in self.futures:
+                future.cancel()
+
+
+def test_queued_work_is_cancelled_once_quota_is_met(monkeypatch):
+    monkeypatch.setattr(utils, 'ThreadPoolExecutor', ManualExecutor)
+    records, downloaded, _ = run(make_extractor(workers=3), lambda result, cancel: ("downloaded", "first"),
+                                 results(6), max_articles=1)
+    assert records == ["first"]
+    executor = ManualExecutor.instances[-1]
+    assert len(executor.futures) == 2
+    assert executor.futures[1].cancelled()
+    assert downloaded == {"https://site0.example.com/story"}
+
+
+def test_cancelled_candidate_releases_its_probe():
+    extractor = make_extractor()
+    extractor.domain_health = DomainHealthRegistry(open_seconds=0)
+    url = "https://site0.example.com/story"
+    for _ in range(extractor.domain_health.failure_threshold):
+        extractor.domain_health.allow(url)
+        extractor.domain_health.record(url, 1.0, success=False)
+
+    cancel = threading.Event()
+    cancel.set()
+    status, record = extractor._process_candidate({'url': url}, "Acme", Deadline(), None, False, cancel=cancel)
+    assert (status, record) == ("skipped", None)
+    assert extractor.domain_health.allow(url)  # the half-open probe is free again
+
+
+def test_cancel_stops_gemini_retries():
+    calls = []
+    cancel = threading.Event()
+
+    class FailingModel:
+        def generate_content(self, prompt, generation_config=None):
+            calls.append(prompt)
+            cancel.set()
+            raise RuntimeError("quota exceeded")
+
+    extractor = make_extractor()
+    extractor.model = FailingModel()
+    start = time.monotonic()
+    response = extractor.query_gemini("prompt", deadline=Deadline(), cancel=cancel)
+    assert len(calls) == 1
+    assert "cancelled" in response
+    assert time.monotonic() - start < 1
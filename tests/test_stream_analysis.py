@@ -0,0 +1,51 @@
+import pytest
+
+pytest.importorskip("newspaper")
+
+from deadline import Deadline  # noqa: E402
+from metrics import track_request  # noqa: E402
+from utils import NewsExtractor  # noqa: E402
+
+RULE_BASED = "Rule-based analysis of the coverage."
+
+
+def extractor_streaming(chunks, error=None):
+    extractor = NewsExtractor.__new__(NewsExtractor)
+    extractor.analysis_prompt_tokens = 600
+    extractor._format_base = lambda company_name, articles_data, deadline: {"Company": company_name, "Articles": []}
+    extractor.analyze_articles_manually = lambda company_name, articles_data: RULE_BASED
+
+    def stream_gemini(prompt, max_tokens=500, deadline=None):
+        yield from chunks
+        if error is not None:
+            raise error
+    extractor.stream_gemini = stream_gemini
+    return extractor
+
+
+def run(extractor):
+    with track_request() as request_metrics:
+        events = list(extractor.stream_company_analysis("Acme", ["article"], deadline=Deadline()))
+    return events, request_metrics.counters.get("analysis_fallback", 0)
+
+
+def test_broken_stream_is_replaced_and_counted_once():
+    events, fallbacks = run(extractor_streaming(["Acme had a strong quarter, with cloud revenue up " * 2],
+                                                error=RuntimeError("connection reset")))
+    assert fallbacks == 1
+    assert {"type": "replace", "text": RULE_BASED} in events
+    assert events[-1]["LLM Analysis"] == RULE_BASED
+
+
+def test_short_stream_falls_back_once():
+    events, fallbacks = run(extractor_streaming([], error=RuntimeError("quota exceeded")))
+    assert fallbacks == 1
+    assert events[-1]["LLM Analysis"] == RULE_BASED
+
+
+def test_complete_stream_is_kept():
+    text = "Acme had a strong quarter, with cloud revenue up sharply and new customers signed."
+    events, fallbacks = run(extractor_streaming([text[:40], text[40:]]))
+    assert fallbacks == 0
+    assert not any(event["type"] == "replace" for event in events)
+    assert events[-1]["LLM Analysis"] == text
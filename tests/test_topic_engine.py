@@ -0,0 +1,39 @@
+import pytest
+
+from topic_engine import TopicMatrix, normalize_topic
+
+
+@pytest.mark.parametrize("topic", ["AI", "A.I.", "a.i", " Artificial Intelligence. "])
+def test_ai_spellings_share_one_key(topic):
+    assert normalize_topic(topic) == "artificial intelligence"
+
+
+@pytest.fixture
+def matrix():
+    return TopicMatrix([["AI", "Cloud"], ["A.I.", "cloud", "Cloud"], ["Layoffs"]], [0.5, -0.5, 0.0])
+
+
+def test_topics_are_merged_across_spellings(matrix):
+    assert matrix.keys == ["artificial intelligence", "cloud", "layoffs"]
+    assert matrix.top_topics() == [("AI", 2), ("Cloud", 2), ("Layoffs", 1)]
+
+
+def test_sentiment_by_topic(matrix):
+    assert matrix.sentiment_by_topic() == {
+        "AI": {"articles": 2, "avg_sentiment": 0.0, "positive": 1, "negative": 1},
+        "Cloud": {"articles": 2, "avg_sentiment": 0.0, "positive": 1, "negative": 1},
+        "Layoffs": {"articles": 1, "avg_sentiment": 0.0, "positive": 0, "negative": 0},
+    }
+    assert list(matrix.sentiment_by_topic(min_articles=2)) == ["AI", "Cloud"]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 512])
+def test_similar_pairs_counts_each_pair_once(matrix, chunk_size):
+    pairs, mean = matrix.similar_pairs(chunk_size=chunk_size)
+    # Only (0, 1) overlap, fully; self-similarity and (1, 0) must not be counted
+    assert pairs == [(0, 1, 1.0)]
+    assert mean == pytest.approx(1 / 3)
+
+
+def test_topic_clusters(matrix):
+    assert matrix.topic_clusters() == [{"topics": ["AI", "Cloud"], "articles": 2}]
@@ -0,0 +1,227 @@
+import re
+from collections import Counter
+
+import numpy as np
+
+# Common spellings of the same topic mapped to one canonical form
+TOPIC_ALIASES = {
+    'ai': 'artificial intelligence',
+    # Looked up after trailing dots are stripped, so this is "A.I." too
+    'a.i': 'artificial intelligence',
+    'genai': 'generative ai',
+    'gen ai': 'generative ai',
+    'ml': 'machine learning',
+    'ev': 'electric vehicles',
+    'evs': 'electric vehicles',
+    'electric vehicle': 'electric vehicles',
+    'ipo': 'initial public offering',
+    'm&a': 'mergers and acquisitions',
+    'mergers & acquisitions': 'mergers and acquisitions',
+    'ceo': 'chief executive',
+    'q1 earnings': 'earnings',
+    'q2 earnings': 'earnings',
+    'q3 earnings': 'earnings',
+    'q4 earnings': 'earnings',
+    'quarterly earnings': 'earnings',
+    'earnings report': 'earnings',
+    'stock': 'stock price',
+    'shares': 'stock price',
+    'share price': 'stock price',
+    'layoff': 'layoffs',
+    'job cuts': 'layoffs',
+}
+
+
+def normalize_topic(topic):
+    """Canonical key for a topic string: case, punctuation, whitespace and known aliases folded."""
+    key = topic.strip().lower()
+    key = re.sub(r'^[\s"\'\[\(\-\*•]+|[\s"\'\]\)\.\,;:]+$', '', key)
+    key = re.sub(r'\s+', ' ', key)
+    key = key.replace('’', "'")
+    return TOPIC_ALIASES.get(key, key)
+
+
+class TopicMatrix:
+    """Article × topic incidence matrix over normalized topics.
+
+    Built from per-article topic lists and sentiment scores; the aggregate views
+    (topic counts, sentiment by topic, article similarity, topic clusters) are all
+    computed with NumPy so they stay fast for thousands of articles.
+    """
+
+    def __init__(self, topic_lists, sentiment_scores=None):
+        self.n_articles = len(topic_lists)
+        vocabulary = {}
+        surface_forms = {}
+        rows = []
+        cols = []
+        for row, topics in enumerate(topic_lists):
+            seen = set()
+            for topic in topics or []:
+                key = normalize_topic(topic)
+                if not key or key in seen:
+                    continue
+                seen.add(key)
+                col = vocabulary.setdefault(key, len(vocabulary))
+                surface_forms.setdefault(key, Counter())[topic.strip()] += 1
+                rows.append(row)
+                cols.append(col)
+
+        self.keys = list(vocabulary)
+        # Show each topic under the spelling the articles used most often
+        self.labels = [surface_forms[key].most_common(1)[0][0] for key in self.keys]
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.cols = np.asarray(cols, dtype=np.int64)
+        self.topic_counts = np.bincount(self.cols, minlength=len(self.keys)).astype(np.int64)
+        self.article_topic_counts = np.bincount(self.rows, minlength=self.n_articles).astype(np.int64)
+
+        if sentiment_scores is None:
+            sentiment_scores = [0.0] * self.n_articles
+        self.sentiment_scores = np.asarray(sentiment_scores, dtype=np.float64)
+
+    def top_topics(self, n=5):
+        """Most frequent topics as (label, count), most frequent first."""
+        order = np.argsort(-self.topic_counts, kind='stable')[:n]
+        return [(self.labels[i], int(self.topic_counts[i])) for i in order]
+
+    def shared_and_unique(self):
+        """Topic counts split into shared (2+ articles) and unique (1 article), most frequent first."""
+        order = np.argsort(-self.topic_counts, kind='stable')
+        shared = {}
+        unique = {}
+        for i in order:
+            count = int(self.topic_counts[i])
+            (shared if count >= 2 else unique)[self.labels[i]] = count
+        return shared, unique
+
+    def sentiment_by_topic(self, min_articles=1):
+        """Article count, mean sentiment and positive/negative split for each topic."""
+        if not self.keys:
+            return {}
+        scores = self.sentiment_scores[self.rows]
+        totals = np.bincount(self.cols, weights=scores, minlength=len(self.keys))
+        positive = np.bincount(self.cols, weights=(scores > 0.1).astype(np.float64), minlength=len(self.keys))
+        negative = np.bincount(self.cols, weights=(scores < -0.1).astype(np.float64), minlength=len(self.keys))
+        means = totals / np.maximum(self.topic_counts, 1)
+
+        result = {}
+        for i in np.argsort(-self.topic_counts, kind='stable'):
+            if self.topic_counts[i] < min_articles:
+                break
+            result[self.labels[i]] = {
+                "articles": int(self.topic_counts[i]),
+                "avg_sentiment": round(float(means[i]), 3),
+                "positive": int(positive[i]),
+                "negative": int(negative[i]),
+            }
+        return result
+
+    def _shared_matrix(self):
+        """Dense 0/1 matrix restricted to topics seen in 2+ articles (others never add overlap)."""
+        shared_cols = np.flatnonzero(self.topic_counts >= 2)
+        position = np.full(len(self.keys), -1, dtype=np.int64)
+        position[shared_cols] = np.arange(len(shared_cols))
+        mask = position[self.cols] >= 0
+        matrix = np.zeros((self.n_articles, len(shared_cols)), dtype=np.float32)
+        matrix[self.rows[mask], position[self.cols[mask]]] = 1.0
+        return matrix, shared_cols
+
+    def similar_pairs(self, top_n=10, min_similarity=0.2, chunk_size=512):
+        """Most similar article pairs by cosine similarity of their topic sets.
+
+        Computed in row chunks so memory stays O(chunk_size × n_articles).
+        Returns (pairs, mean similarity over all pairs).
+        """
+        if self.n_articles < 2 or not self.keys:
+            return [], 0.0
+
+        matrix, _ = self._shared_matrix()
+        norms = np.sqrt(np.maximum(self.article_topic_counts, 1)).astype(np.float32)
+        normalized = matrix / norms[:, None]
+
+        candidates_i = []
+        candidates_j = []
+        candidates_s = []
+        similarity_sum = 0.0
+        for start in range(0, self.n_articles, chunk_size):
+            block = normalized[start:start + chunk_size] @ normalized.T
+            row_index = np.arange(start, start + block.shape[0])
+            # Only count each unordered pair once (j > i)
+            block[np.arange(block.shape[0])[:, None] >= (np.arange(self.n_articles)[None, :] - start)] = 0.0
+            similarity_sum += float(block.sum())
+            hits = np.argwhere(block >= min_similarity)
+            if len(hits):
+                candidates_i.append(row_index[hits[:, 0]])
+                candidates_j.append(hits[:, 1])
+                candidates_s.append(block[hits[:, 0], hits[:, 1]])
+
+        pair_count = self.n_articles * (self.n_articles - 1) / 2
+        mean_similarity = similarity_sum / pair_count
+        if not candidates_s:
+            return [], mean_similarity
+
+        all_i = np.concatenate(candidates_i)
+        all_j = np.concatenate(candidates_j)
+        all_s = np.concatenate(candidates_s)
+        order = np.argsort(-all_s, kind='stable')[:top_n]
+        pairs = [(int(all_i[k]), int(all_j[k]), round(float(all_s[k]), 3)) for k in order]
+        return pairs, mean_similarity
+
+    def topic_clusters(self, max_topics=200, min_jaccard=0.3, min_size=2):
+        """Groups of topics that tend to appear in the same articles.
+
+        Uses the Jaccard overlap of the article sets of the `max_topics` most frequent
+        shared topics, linked into connected components.
+        """
+        matrix, shared_cols = self._shared_matrix()
+        if len(shared_cols) < 2:
+            return []
+
+        top = np.argsort(-self.topic_counts[shared_cols], kind='stable')[:max_topics]
+        sub = matrix[:, top]
+        co_occurrence = sub.T @ sub
+        counts = np.diag(co_occurrence)
+        union = counts[:, None] + counts[None, :] - co_occurrence
+        jaccard = np.divide(co_occurrence, union, out=np.zeros_like(co_occurrence), where=union > 0)
+        np.fill_diagonal(jaccard, 0.0)
+
+        # Union-find over the linked topic pairs
+        parent = np.arange(len(top))
+
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for a, b in np.argwhere(np.triu(jaccard >= min_jaccard)):
+            root_a, root_b = find(a), find(b)
+            if root_a != root_b:
+                parent[root_b] = root_a
+
+        groups = {}
+        for member in range(len(top)):
+            groups.setdefault(find(member), []).append(member)
+
+        clusters = []
+        for members in groups.values():
+            if len(members) < min_size:
+                continue
+            labels = [self.labels[shared_cols[top[m]]] for m in members]
+            clusters.append({
+                "topics": labels,
+                "articles": int(np.count_nonzero(sub[:, members].sum(axis=1))),
+            })
+        clusters.sort(key=lambda c: c["articles"], reverse=True)
+        return clusters
+
+
+def build_topic_matrix(articles_data):
+    """TopicMatrix for a list of ArticleRecords."""
+    scores = []
+    for article in articles_data:
+        try:
+            scores.append(float(article.sentiment_score))
+        except (TypeError, ValueError):
+            scores.append(0.0)
+    return TopicMatrix([article.topics for article in articles_data], scores)
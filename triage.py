@@ -0,0 +1,86 @@
+import re
+from collections import deque
+
+from domain_health import domain_of
+from local_analyzer import HIGH_IMPACT_TERMS
+from metrics import timed
+from prompt_builder import company_terms
+
+_WORD = re.compile(r'[a-z]+')
+
+
+def relevance(result, terms):
+    """How much a search result's title and snippet are about the company."""
+    title = result.get('title', '').lower()
+    snippet = result.get('snippet', '').lower()
+    score = 0.0
+    if terms:
+        if terms[0] in title:
+            score += 4.0
+        elif any(term in title for term in terms):
+            score += 3.0
+        score += min(2, max(snippet.count(term) for term in terms))
+    if not HIGH_IMPACT_TERMS.isdisjoint(_WORD.findall(title + ' ' + snippet)):
+        score += 0.5
+    return score
+
+
+def rank_candidates(results, company_name, domain_health=None, health_weight=1.0, diversity_penalty=1.5):
+    """Order search results by how worth downloading they are.
+
+    Each result is scored on title/snippet relevance, minus its domain's health
+    penalty; then results are picked greedily, each pick from a domain lowering
+    that domain's later results by diversity_penalty so one outlet can't fill the
+    quota. Page order breaks ties. Sets result['triage_score'] on every result.
+    """
+    terms = company_terms(company_name)
+    remaining = []
+    for position, result in enumerate(results):
+        score = relevance(result, terms) - 0.01 * position
+        if domain_health is not None:
+            score -= health_weight * domain_health.priority(result['url'])
+        result['triage_score'] = round(score, 3)
+        remaining.append((score, domain_of(result['url']), result))
+
+    ranked = []
+    picked = {}
+    while remaining:
+        best = max(range(len(remaining)),
+                   key=lambda i: remaining[i][0] - diversity_penalty * picked.get(remaining[i][1], 0))
+        _, domain, result = remaining.pop(best)
+        picked[domain] = picked.get(domain, 0) + 1
+        ranked.append(result)
+    return ranked
+
+
+class CandidatePool:
+    """Ranked search results for one request, fetched a batch at a time as they are used up.
+
+    fetch_batch(target, page, seen_urls) returns (new candidates, next page),
+    as NewsExtractor.gather_candidates does.
+    """
+
+    def __init__(self, fetch_batch, company_name, domain_health=None, max_pages=5):
+        self.fetch_batch = fetch_batch
+        self.company_name = company_name
+        self.domain_health = domain_health
+        self.max_pages = max_pages
+        self.page = 0
+        # Every candidate in search order, for the triage report
+        self.searched = []
+        self.seen_urls = set()
+        self._queue = deque()
+
+    def next(self, wanted):
+        """The best remaining candidate, searching up to `wanted` more if none are left; None when exhausted."""
+        if not self._queue:
+            if self.page >= self.max_pages:
+                return None
+            batch, self.page = self.fetch_batch(wanted, self.page, self.seen_urls)
+            if not batch:
+                self.page = self.max_pages
+                return None
+            self.searched.extend(batch)
+            with timed("triage"):
+                self._queue.extend(rank_candidates(batch, self.company_name, self.domain_health))
+        return self._queue.popleft()
@@ -7,43 +7,136 @@ import re
 import json
 import time
 import random
+import math
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import google.generativeai as genai
-from collections import Counter
 import socket
-import dns.resolver
 from deep_translator import GoogleTranslator
 import gtts
 import nltk
+import logging
+from metrics import timed, count
+from deadline import Deadline, StageTimeout, run_with_timeout
+from domain_health import DomainHealthRegistry
+from http_client import get_session, fetch_article_html, DownloadRejected, MAX_ARTICLE_BYTES
+from records import ArticleRecord
+from topic_engine import build_topic_matrix
+from local_analyzer import LLMPolicy, analyze_text, extract_keywords, record_agreement
+from prompt_builder import build_article_prompt, build_analysis_prompt
+from recency import snippet_date, last_modified
+from triage import CandidatePool
+import dns_cache
+
+logger = logging.getLogger(__name__)
 
 # Download NLTK data
 nltk.download('punkt')
 
 def configure_dns():
-    """Configure DNS resolution to use Google DNS servers"""
+    """Route all socket name resolution through a TTL-respecting cache backed by Google DNS.
+
+    Safe to call repeatedly; the cache is only installed once.
+    """
     # Use Google's public DNS servers
-    dns.resolver.default_resolver = dns.resolver.Resolver(configure=False)
-    dns.resolver.default_resolver.nameservers = ['8.8.8.8', '8.8.4.4']
+    cache = dns_cache.install(nameservers=['8.8.8.8', '8.8.4.4'])
     
     # Set socket default timeout
     socket.setdefaulttimeout(30)  # 30 seconds timeout
     
-    print("Configured custom DNS resolution with Google DNS servers")
+    return cache
 
 # Call this function before initializing the API
 configure_dns()
 
+# DownloadRejected reasons that skip a URL without counting against its domain's health
+SKIPPED_DOWNLOADS = ('content_type', 'too_large', 'cancelled')
+
+
+def _is_domain_fault(error, stage_timeouts):
+    """Whether an extraction error says something about the article's domain.
+
+    Skipped downloads don't, and neither do timeouts where the call ran for less
+    than its stage's own limit: those were cut short by the request deadline or
+    spent their time waiting for a free stage worker.
+    """
+    if isinstance(error, DownloadRejected):
+        return error.reason not in SKIPPED_DOWNLOADS
+    if isinstance(error, StageTimeout):
+        return error.ran >= stage_timeouts.get(error.stage, error.timeout)
+    return True
+
+
+class _LLMCalls:
+    """Gemini calls made for one request, shared by concurrent extractions."""
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def claim(self, local):
+        """Whether this article goes to Gemini under the policy; counts the call if so."""
+        with self._lock:
+            if not self.policy.needs_llm(local, self.count):
+                return False
+            self.count += 1
+            return True
+
 class NewsExtractor:
-    def __init__(self, gemini_api_key):
+    # Google News search endpoint; overridable so benchmarks can point at local fixtures
+    search_url_template = "https://www.google.com/search?q={query}+news&tbm=nws&start={start}"
+
+    def __init__(self, gemini_api_key, domain_health=None):
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
         
+        # Politeness delays (seconds) between articles and between search pages
+        self.request_delay = (1, 3)
+        self.page_delay = (3, 5)
+        
+        # Per-stage timeouts (seconds); each is further capped by the request deadline
+        self.stage_timeouts = {'download': 15, 'parse': 10, 'llm': 30}
+        # Default overall budget for one analysis, kept under the UI's 300s client timeout
+        self.default_budget = 240
+        # Budget held back from article processing for the final company-level analysis
+        self.final_analysis_reserve = 20
+        
+        # Memory bounds: article text kept per article, and articles per request
+        self.max_text_chars = 5000
+        self.max_articles_limit = 50
+        # Article downloads: body size cap in bytes (the redirect cap lives on the HTTP session)
+        self.max_download_bytes = MAX_ARTICLE_BYTES
+        # HEAD request timeout when checking an undated result against a `since` window
+        self.head_check_timeout = 3
+        # Search results fetched and ranked per article wanted; only the best ranked are downloaded
+        self.triage_overfetch = 2
+        # Speculative extraction: concurrent extractions per article still needed, and the worker cap
+        self.speculative = False
+        self.speculative_overprovision = 1.5
+        self.speculative_workers = 8
+        
+        # Which articles get a Gemini read after the local lexicon pass (LLM_POLICY env var)
+        self.llm_policy = LLMPolicy.from_env()
+        
+        # Estimated input-token budgets for the per-article and company-level prompts
+        # (the pre-builder prompts sent about 500 and 800 tokens)
+        self.article_prompt_tokens = 300
+        self.analysis_prompt_tokens = 600
+        
+        # Learned per-domain download health, shared across requests and persisted locally
+        self.domain_health = domain_health or DomainHealthRegistry(
+            os.environ.get('DOMAIN_HEALTH_PATH', 'domain_health.json'))
+        
         # Initialize Gemini API with error handling and retries
         self.gemini_api_key = gemini_api_key
-        genai.configure(api_key=self.gemini_api_key)
+        # REST transport sends Gemini calls over the socket layer, and so through the DNS cache
+        genai.configure(api_key=self.gemini_api_key, transport=os.environ.get('GEMINI_TRANSPORT', 'rest'))
         
         # Set up Gemini model with retries
-        print("Setting up Gemini API...")
+        logger.info("Setting up Gemini API...")
         self.setup_gemini_with_retry()
         
     def setup_gemini_with_retry(self, max_retries=3):
@@ -52,108 +145,196 @@ class NewsExtractor:
         while retry_count < max_retries:
             try:
                 self.model = genai.GenerativeModel('gemini-2.0-flash')
-                print("Gemini API setup complete.")
+                logger.info("Gemini API setup complete.")
                 return
             except Exception as e:
                 retry_count += 1
-                print(f"Attempt {retry_count} failed: {str(e)}")
+                logger.warning("Gemini setup attempt=%d failed: %s", retry_count, e)
                 if retry_count < max_retries:
-                    print(f"Retrying in {retry_count * 2} seconds...")
+                    logger.info("Retrying Gemini setup in %d seconds", retry_count * 2)
                     time.sleep(retry_count * 2)
                 else:
-                    print("Failed to set up Gemini API after maximum retries.")
+                    logger.error("Failed to set up Gemini API after maximum retries.")
                     self.model = None
                     raise
 
-    def query_gemini(self, prompt, max_tokens=500):
-        """Query the Gemini model with retry logic."""
+    def query_gemini(self, prompt, max_tokens=500, deadline=None, cancel=None):
+        """Query the Gemini model with retry logic, bounded by the LLM timeout and deadline.
+
+        A set `cancel` event stops further attempts and cuts the backoff short; an
+        attempt already sent still runs to completion.
+        """
         if self.model is None:
             return "Gemini API is not available. Using fallback analysis."
             
+        deadline = deadline or Deadline()
         max_retries = 3
         retry_count = 0
         backoff_factor = 2
         
         while retry_count < max_retries:
+            if deadline.expired():
+                count("gemini_deadline")
+                logger.warning("Skipping Gemini call, request deadline reached")
+                return "Analysis could not be generated within the time budget. Using fallback analysis."
+            if cancel is not None and cancel.is_set():
+                count("gemini_cancelled")
+                return "Analysis was cancelled. Using fallback analysis."
+
             try:
-                print(f"Generating text with Gemini API (attempt {retry_count + 1})...")
-                response = self.model.generate_content(
-                    prompt,
-                    generation_config=genai.types.GenerationConfig(
-                        max_output_tokens=max_tokens,
-                        temperature=0.7,
-                        top_p=0.95,
-                        top_k=40,
+                logger.debug("Generating text with Gemini API attempt=%d", retry_count + 1)
+                with timed("gemini"):
+                    response = run_with_timeout(
+                        "llm",
+                        deadline.timeout_for(self.stage_timeouts['llm']),
+                        self.model.generate_content,
+                        prompt,
+                        generation_config=genai.types.GenerationConfig(
+                            max_output_tokens=max_tokens,
+                            temperature=0.7,
+                            top_p=0.95,
+                            top_k=40,
+                        )
                     )
-                )
                 return response.text
                 
             except Exception as e:
                 retry_count += 1
                 error_message = str(e)
-                print(f"Error querying Gemini (attempt {retry_count}): {error_message}")
+                logger.warning("Error querying Gemini attempt=%d: %s", retry_count, error_message)
+                if isinstance(e, StageTimeout):
+                    count("gemini_timeout")
                 
                 # Handle different types of errors
                 if "DNS resolution failed" in error_message or "Timeout" in error_message:
-                    # Try to reconfigure DNS for next attempt
-                    configure_dns()
+                    # Drop cached failed lookups so the next attempt resolves afresh
+                    cache = dns_cache.get_cache()
+                    if cache:
+                        cache.clear(negative_only=True)
                 
                 if retry_count < max_retries:
-                    # Exponential backoff
+                    count("gemini_retry")
+                    # Exponential backoff, never sleeping past the deadline
                     wait_time = backoff_factor ** retry_count
-                    print(f"Retrying in {wait_time} seconds...")
-                    time.sleep(wait_time)
+                    logger.info("Retrying Gemini in %d seconds", wait_time)
+                    deadline.sleep(wait_time, cancel=cancel)
                 else:
-                    print("Failed to query Gemini API after maximum retries.")
+                    count("gemini_failure")
+                    logger.error("Failed to query Gemini API after maximum retries.")
                     return "Analysis could not be generated due to API error. Using fallback analysis."
 
+    def stream_gemini(self, prompt, max_tokens=500, deadline=None):
+        """Stream a Gemini completion, yielding text chunks as they arrive.
+
+        Closing the generator early (e.g. the HTTP client went away) cancels the
+        underlying stream so no further output tokens are generated.
+        """
+        if self.model is None:
+            raise RuntimeError("Gemini API is not available.")
+
+        deadline = deadline or Deadline()
+        with timed("gemini_stream_start"):
+            response = run_with_timeout(
+                "llm",
+                deadline.timeout_for(self.stage_timeouts['llm']),
+                self.model.generate_content,
+                prompt,
+                generation_config=genai.types.GenerationConfig(
+                    max_output_tokens=max_tokens,
+                    temperature=0.7,
+                    top_p=0.95,
+                    top_k=40,
+                ),
+                stream=True
+            )
+
+        finished = False
+        try:
+            with timed("gemini_stream"):
+                for chunk in response:
+                    text = getattr(chunk, 'text', '')
+                    if text:
+                        yield text
+                    if deadline.expired():
+                        count("gemini_stream_deadline")
+                        logger.warning("Stopping Gemini stream, request deadline reached")
+                        break
+                else:
+                    finished = True
+        finally:
+            if not finished:
+                count("gemini_stream_cancelled")
+                self._cancel_stream(response)
+
+    def _cancel_stream(self, response):
+        """Best-effort cancel of an in-flight streaming response (gRPC call or REST iterator)."""
+        iterator = getattr(response, '_iterator', None)
+        for target in (iterator, getattr(iterator, '_response', None)):
+            for method in ('cancel', 'close'):
+                cancel = getattr(target, method, None)
+                if callable(cancel):
+                    try:
+                        cancel()
+                        return
+                    except Exception as e:
+                        logger.debug("Could not cancel Gemini stream: %s", e)
+
     def translate_to_hindi(self, text):
         """Translate the given text to Hindi."""
         try:
-            print("Translating text to Hindi...")
-            translator = GoogleTranslator(source='auto', target='hi')
-            hindi_text = translator.translate(text)
-            print("Translation complete.")
+            logger.info("Translating text to Hindi...")
+            with timed("translate"):
+                translator = GoogleTranslator(source='auto', target='hi')
+                hindi_text = translator.translate(text)
+            logger.info("Translation complete.")
             return hindi_text
         except Exception as e:
-            print(f"Error translating to Hindi: {str(e)}")
+            count("translate_failure")
+            logger.error("Error translating to Hindi: %s", e)
             return "Hindi translation failed."
     
     def generate_hindi_speech(self, text, output_file="analysis_hindi.mp3"):
         """Generate Hindi speech for the given text."""
         try:
-            print("Translating analysis to Hindi...")
+            logger.info("Translating analysis to Hindi...")
             # First translate the text to Hindi
             hindi_text = self.translate_to_hindi(text)
             
-            print("Generating Hindi speech...")
-            # Generate speech from Hindi text
-            tts = gtts.gTTS(text=hindi_text, lang='hi', slow=False)
-            
+            logger.info("Generating Hindi speech...")
             # Ensure the static folder exists
             os.makedirs('static', exist_ok=True)
             file_path = os.path.join('static', output_file)
             
-            tts.save(file_path)
-            print(f"Hindi speech generated and saved to {file_path}")
+            with timed("tts"):
+                # Generate speech from Hindi text
+                tts = gtts.gTTS(text=hindi_text, lang='hi', slow=False)
+                tts.save(file_path)
+            logger.info("Hindi speech generated path=%s", file_path)
             return file_path, hindi_text
         except Exception as e:
-            print(f"Error generating Hindi speech: {str(e)}")
+            count("tts_failure")
+            logger.error("Error generating Hindi speech: %s", e)
             return None, "Hindi speech generation failed."
 
-    def get_search_results(self, company_name, num_results=15, page=0):
-        """Get search results for a company name."""
+    def get_search_results(self, company_name, num_results=15, page=0, deadline=None, since=None):
+        """Get search results for a company name, restricted to the `since` TimeWindow when given."""
+        deadline = deadline or Deadline()
         start_param = page * 10  # Google uses multiples of 10 for pagination
-        search_url = f"https://www.google.com/search?q={quote_plus(company_name)}+news&tbm=nws&start={start_param}"
+        search_url = self.search_url_template.format(query=quote_plus(company_name), start=start_param)
+        if since is not None:
+            search_url += "&tbs=" + quote_plus(since.search_param, safe=':,')
 
         try:
-            response = requests.get(search_url, headers=self.headers, timeout=10)
-            response.raise_for_status()
+            with timed("search_fetch"):
+                response = get_session().get(search_url, headers=self.headers, timeout=deadline.timeout_for(10))
+                response.raise_for_status()
         except requests.exceptions.RequestException as e:
-            print(f"Failed to fetch search results: {str(e)}")
+            count("search_failure")
+            logger.error("Failed to fetch search results page=%d: %s", page, e)
             return []
 
-        soup = BeautifulSoup(response.text, 'html.parser')
+        with timed("search_parse"):
+            soup = BeautifulSoup(response.text, 'html.parser')
         search_results = []
 
         # Extract news links from Google search results
@@ -176,7 +357,9 @@ class NewsExtractor:
                     search_results.append({
                         'title': title,
                         'url': link,
-                        'snippet': snippet
+                        'snippet': snippet,
+                        # "3 days ago" / "Mar 5, 2024" shown with the result, if any
+                        'date': snippet_date(g.stripped_strings)
                     })
 
         # Filter out duplicates based on URL
@@ -206,60 +389,84 @@ class NewsExtractor:
 
         return not any(site in domain for site in js_heavy_sites)
 
-    def extract_article_content(self, url):
-        """Extract article content from a URL using newspaper3k."""
+    def extract_article_content(self, url, deadline=None, cancel=None):
+        """Extract article content from a URL using newspaper3k, within the download and parse timeouts.
+
+        A set `cancel` event (threading.Event) abandons the download between chunks.
+        """
+        deadline = deadline or Deadline()
         try:
+            download_timeout = deadline.timeout_for(self.stage_timeouts['download'])
             article = Article(url)
-            article.download()
-            article.parse()
-            article.nlp()
+            with timed("download"):
+                # Bounded, content-type-checked download; newspaper only gets pages that look like articles
+                html = run_with_timeout("download", download_timeout, lambda: fetch_article_html(
+                    url, timeout=max(1, download_timeout or 10), max_bytes=self.max_download_bytes, cancel=cancel))
+            article.download(input_html=html)
+            del html
+
+            def parse_article():
+                with timed("parse"):
+                    article.parse()
+                # Release the raw HTML and DOM trees before nlp; only the text is needed from here
+                article.html = ''
+                article.doc = article.clean_doc = None
+                article.top_node = article.clean_top_node = None
+                with timed("nlp"):
+                    article.nlp()
+
+            run_with_timeout("parse", deadline.timeout_for(self.stage_timeouts['parse']), parse_article)
 
             return {
                 'title': article.title,
-                'text': article.text,
+                'text': article.text[:self.max_text_chars],
                 'summary': article.summary,
                 'keywords': article.keywords,
                 'publish_date': article.publish_date,
-                'success': True
+                'success': True,
+                'rejected': None,
+                'domain_fault': False
             }
         except Exception as e:
-            print(f"Failed to extract content from {url}: {str(e)}")
+            if isinstance(e, StageTimeout):
+                count(f"{e.stage}_timeout")
+            if not (isinstance(e, DownloadRejected) and e.reason == "cancelled"):
+                count("extract_failure")
+            if isinstance(e, DownloadRejected):
+                logger.info("Skipped download url=%s reason=%s", url, e.reason)
+            else:
+                logger.warning("Failed to extract content url=%s: %s", url, e)
             return {
                 'title': "Extraction failed",
                 'text': "",
                 'summary': "",
                 'keywords': [],
                 'publish_date': None,
-                'success': False
+                'success': False,
+                # Why the page was not worth downloading (DownloadRejected.reason), if that is why it failed
+                'rejected': e.reason if isinstance(e, DownloadRejected) else None,
+                # False when the failure should not count against the domain's health
+                'domain_fault': _is_domain_fault(e, self.stage_timeouts)
             }
 
-    def extract_topics_and_summary_combined(self, text):
-        """Extract topics, generate a summary, and analyze sentiment using Gemini model in a single query."""
+    def extract_topics_and_summary_combined(self, text, deadline=None, local=None, company_name=None, cancel=None):
+        """Extract topics, generate a summary, and analyze sentiment using Gemini model in a single query.
+
+        `local` is the article's local lexicon analysis; its sentiment replaces the
+        neutral default when Gemini gives no usable answer. The last value returned
+        is the analysis source: "llm", or "local" when Gemini gave no sentiment.
+        """
         if not text:
-            return [], "No content available for analysis.", "neutral", 0.0
+            return [], "No content available for analysis.", "neutral", 0.0, "local"
         
         # Limit text to avoid token overflow
         truncated_text = text[:5000]
         
-        # SINGLE QUERY: Generate summary, topics and sentiment with Gemini
-        combined_prompt = f"""Analyze this article and provide four outputs:
+        # SINGLE QUERY: Generate summary, topics and sentiment with Gemini,
+        # from the most informative sentences that fit the token budget
+        combined_prompt = build_article_prompt(truncated_text, company_name, self.article_prompt_tokens)
         
-        1. SUMMARY: Summarize this article in 3-4 sentences.
-        2. TOPICS: Extract 5 key topics (single words or short phrases) from this article. List only the topics separated by commas.
-        3. SENTIMENT: Analyze the sentiment of the article (positive, negative, neutral). Only provide 1 word
-        4. SENTIMENT_SCORE: Provide a sentiment score between -1 and 1, where -1 is very negative, 0 is neutral, and 1 is very positive.
-        
-        Format your response as:
-        SUMMARY: [your summary here]
-        TOPICS: [topic1, topic2, topic3, topic4, topic5]
-        SENTIMENT: [positive/negative/neutral]
-        SENTIMENT_SCORE: [score]
-        
-        Article text:
-        {truncated_text[:2000]}
-        """
-        
-        combined_response = self.query_gemini(combined_prompt, 300)
+        combined_response = self.query_gemini(combined_prompt, 300, deadline=deadline, cancel=cancel)
         
         # Parse the response
         summary = ""
@@ -287,99 +494,319 @@ class NewsExtractor:
             except ValueError:
                 sentiment_score = 0.0
         
+        if local is not None:
+            if sentiment_match:
+                record_agreement(local, sentiment, sentiment_score)
+            else:
+                count("sentiment_local_fallback")
+                sentiment, sentiment_score = local.sentiment, local.sentiment_score
+        
         # Provide fallbacks if extraction fails
         if not summary or len(summary) < 10:
-            if isinstance(text, dict) and 'summary' in text and len(text['summary']) > 10:
-                summary = text['summary']
-            else:
-                sentences = re.split(r'(?<=[.!?])\s+', truncated_text)
-                summary = ' '.join(sentences[:3]) if sentences else "No summary available."
+            summary = self._fallback_summary(truncated_text)
         
         if not topics:
-            topics = self._extract_keywords(truncated_text, 5)
+            topics = local.keywords if local is not None else self._extract_keywords(truncated_text, 5)
         
-        return topics, summary, sentiment, sentiment_score
+        return topics, summary, sentiment, sentiment_score, "llm" if sentiment_match else "local"
+
+    def _fallback_summary(self, text):
+        """First three sentences of the article, used when no LLM summary is available."""
+        sentences = re.split(r'(?<=[.!?])\s+', text)
+        return ' '.join(sentences[:3]) if sentences else "No summary available."
 
     def _extract_keywords(self, text, num_keywords=5):
         """Extract keywords using frequency analysis."""
-        # Simple keyword extraction based on frequency
-        words = re.findall(r'\b[a-zA-Z]{4,}\b', text.lower())
-        stopwords = {'about', 'after', 'also', 'been', 'from', 'have', 'more', 'most', 'other', 'said', 'some', 'that', 'their', 'them', 'then', 'there', 'these', 'they', 'this', 'were', 'what', 'when', 'which', 'with', 'would'}
-        filtered_words = [w for w in words if w not in stopwords]
-        
-        # Count word frequency
-        word_counts = {}
-        for word in filtered_words:
-            if word in word_counts:
-                word_counts[word] += 1
-            else:
-                word_counts[word] = 1
-        
-        # Get top keywords
-        sorted_words = sorted(word_counts.items(), key=lambda x: x[1], reverse=True)
-        return [word for word, count in sorted_words[:num_keywords]]
+        return extract_keywords(text, num_keywords)
 
-    def extract_and_analyze(self, company_name, max_articles=10):
-        """Extract news articles about a company and analyze their content."""
-        print(f"Searching for news about {company_name}...")
+    def is_stale(self, result, since, deadline):
+        """Whether a search result is known to predate the `since` window, checked before downloading it.
 
-        articles_data = []
-        counter = 0
-        page = 0
-        max_pages = 5  # Limit to 5 pages of results to avoid excessive requests
+        Uses the date shown in the search result, else a HEAD request's
+        Last-Modified. Results with no date at all are kept.
+        """
+        if since.is_stale(result.get('date')):
+            count("skipped_stale_snippet")
+            return True
+        if result.get('date') is None:
+            with timed("head_check"):
+                modified = last_modified(get_session(), result['url'], deadline.timeout_for(self.head_check_timeout))
+            if since.is_stale(modified):
+                count("skipped_stale_head")
+                return True
+        return False
 
-        while counter < max_articles and page < max_pages:
-            print(f"Fetching page {page+1} of Google News results...")
-            search_results = self.get_search_results(company_name, num_results=max_articles+5, page=page)
+    def gather_candidates(self, company_name, target, page, deadline, since=None, seen_urls=None, max_pages=5):
+        """Search results from `page` onwards until `target` new candidates are collected.
 
-            if not search_results:
-                print(f"No more results found on page {page+1}")
+        Returns (candidates in search order, next page to fetch). JS-heavy sites
+        and URLs already in seen_urls are left out.
+        """
+        seen_urls = set() if seen_urls is None else seen_urls
+        candidates = []
+        while len(candidates) < target and page < max_pages:
+            if deadline.expired(self.final_analysis_reserve):
                 break
+            if page > 0:
+                deadline.sleep(random.uniform(*self.page_delay))
+
+            logger.info("Fetching Google News results page=%d", page + 1)
+            search_results = self.get_search_results(company_name, num_results=target, page=page,
+                                                     deadline=deadline, since=since)
+            page += 1
+            if not search_results:
+                logger.info("No more results found page=%d", page)
+                return candidates, max_pages
 
             for result in search_results:
-                if counter >= max_articles:
-                    break
+                if result['url'] in seen_urls:
+                    continue
+                seen_urls.add(result['url'])
+                if not self.is_compatible_site(result['url']):
+                    count("skipped_js_site")
+                    logger.info("Skipping potentially JS-heavy site url=%s", result['url'])
+                    continue
+                candidates.append(result)
+        return candidates, page
 
-                url = result['url']
-                print(f"Processing article {counter+1}: {url}")
+    def extract_and_analyze(self, company_name, max_articles=10, deadline=None, keep_text=False, llm_policy=None,
+                            since=None, speculative=None):
+        """Extract news articles about a company and analyze them into ArticleRecords.
 
-                if not self.is_compatible_site(url):
-                    print(f"Skipping potentially JS-heavy site: {url}")
-                    continue
+        Search results are over-fetched (triage_overfetch candidates per wanted
+        article) and ranked by title/snippet relevance, source diversity and domain
+        health; only the best ones are downloaded and analyzed. More pages are
+        fetched only if the ranked candidates run out.
+
+        With `speculative` (default self.speculative), candidates are extracted
+        concurrently instead of one by one; see _run_speculative.
+
+        Every article gets the local lexicon pass; `llm_policy` (default
+        self.llm_policy) decides which of them also go to Gemini.
+
+        `since` (a recency.TimeWindow) is passed to the search and drops results
+        dated before it: by the search snippet or Last-Modified before the
+        download, and by the article's publish date before the Gemini call.
+
+        Stops early when the deadline (minus the final analysis reserve) runs out;
+        `deadline.exhausted` then tells the caller the result is partial. Article
+        text is only kept on the records when keep_text is set.
+        """
+        deadline = deadline or Deadline()
+        llm_policy = llm_policy or self.llm_policy
+        speculative = self.speculative if speculative is None else speculative
+        llm_calls = _LLMCalls(llm_policy)
+        max_articles = min(max_articles, self.max_articles_limit)
+        logger.info("Searching for news company=%s max_articles=%d speculative=%s",
+                    company_name, max_articles, speculative)
+
+        max_pages = 5  # Limit to 5 pages of results to avoid excessive requests
+        pool = CandidatePool(
+            lambda target, page, seen_urls: self.gather_candidates(
+                company_name, target, page, deadline, since=since, seen_urls=seen_urls, max_pages=max_pages),
+            company_name, self.domain_health, max_pages=max_pages)
+
+        def process(result, cancel=None):
+            return self._process_candidate(result, company_name, deadline, llm_calls, keep_text,
+                                           since=since, cancel=cancel)
+
+        # Triage bookkeeping: which candidates were downloaded, and which were skipped without a download
+        downloaded = set()
+        skipped = set()
+
+        if speculative:
+            articles_data = self._run_speculative(pool, process, max_articles, deadline, downloaded, skipped)
+        else:
+            articles_data = []
+            while len(articles_data) < max_articles:
+                if deadline.expired(self.final_analysis_reserve):
+                    logger.warning("Request deadline reached, returning articles=%d", len(articles_data))
+                    break
 
-                article_content = self.extract_article_content(url)
+                result = pool.next((max_articles - len(articles_data)) * self.triage_overfetch)
+                if result is None:
+                    break
+                logger.info("Processing article n=%d url=%s score=%s",
+                            len(articles_data) + 1, result['url'], result['triage_score'])
 
-                if not article_content['success'] or not article_content['text']:
-                    print(f"Could not extract content from {url}")
+                status, record = process(result)
+                (downloaded if status == "downloaded" else skipped).add(result['url'])
+                if record is None:
                     continue
 
-                # Extract topics and summary using Gemini in a single query
-                topics, summary, sentiment, sentiment_score = self.extract_topics_and_summary_combined(article_content['text'])
-
-                articles_data.append({
-                    'title': article_content['title'],
-                    'url': url,
-                    'summary': summary,
-                    'topics': topics,
-                    'sentiment': sentiment,
-                    'sentiment_score': sentiment_score,
-                    'text': article_content['text'][:5000],  # Limit text size for storage
-                    'publish_date': article_content['publish_date'],
-                })
-
-                counter += 1
-                time.sleep(random.uniform(1, 3))
-
-            if counter < max_articles:
-                page += 1
-                print(f"Only {counter} articles processed so far, moving to page {page+1}...")
-                time.sleep(random.uniform(3, 5))
-            else:
-                break
+                articles_data.append(record)
+                deadline.sleep(random.uniform(*self.request_delay))
 
-        print(f"Processed a total of {counter} articles across {page+1} pages.")
+        self._record_triage(pool.searched, downloaded, skipped, len(articles_data), llm_calls.count)
+        count("articles_processed", len(articles_data))
+        logger.info("Processed articles=%d pages=%d", len(articles_data), pool.page)
         return articles_data
 
+    def _process_candidate(self, result, company_name, deadline, llm_calls, keep_text, since=None, cancel=None):
+        """Download and analyze one search result.
+
+        Returns (status, ArticleRecord or None); status is "downloaded", or
+        "skipped" when the result was dropped without downloading it. A set
+        `cancel` event stops the work before the next download or Gemini attempt.
+        """
+        url = result['url']
+
+        if not self.domain_health.allow(url):
+            count("skipped_open_circuit")
+            logger.info("Skipping domain with open circuit url=%s", url)
+            return "skipped", None
+
+        if since is not None and self.is_stale(result, since, deadline):
+            # allow() may have handed out the domain's half-open probe; nothing will be recorded for it
+            self.domain_health.release(url)
+            logger.info("Skipping article older than window url=%s since=%s", url, since.spec)
+            return "skipped", None
+
+        if cancel is not None and cancel.is_set():
+            self.domain_health.release(url)
+            return "skipped", None
+
+        extract_start = time.monotonic()
+        article_content = self.extract_article_content(url, deadline=deadline, cancel=cancel)
+        if (cancel is not None and cancel.is_set()) or \
+                (not article_content['success'] and not article_content['domain_fault']):
+            # Cancelled, a PDF or oversized link, or a timeout caused by the deadline or a busy
+            # stage pool: none of that is the domain's fault, so keep it out of the health stats
+            self.domain_health.release(url)
+            return "downloaded", None
+        self.domain_health.record(
+            url,
+            time.monotonic() - extract_start,
+            success=article_content['success'],
+            empty=not article_content['text']
+        )
+
+        if not article_content['success'] or not article_content['text']:
+            count("empty_article")
+            logger.info("Could not extract content url=%s", url)
+            return "downloaded", None
+
+        if since is not None and since.is_stale(article_content['publish_date']):
+            count("skipped_stale_published")
+            logger.info("Skipping article published before window url=%s since=%s", url, since.spec)
+            return "downloaded", None
+
+        # Cheap local pass first; it is the fallback and decides whether Gemini is needed
+        with timed("local_analysis"):
+            local = analyze_text(article_content['text'])
+
+        if cancel is not None and cancel.is_set():
+            count("llm_cancelled")
+            return "downloaded", None
+
+        if llm_calls.claim(local):
+            # Extract topics and summary using Gemini in a single query
+            topics, summary, sentiment, sentiment_score, analysis_source = self.extract_topics_and_summary_combined(
+                article_content['text'], deadline=deadline, local=local, company_name=company_name,
+                cancel=cancel)
+        else:
+            count("llm_skipped_local")
+            analysis_source = "local"
+            topics, summary, sentiment, sentiment_score = (
+                local.keywords, self._fallback_summary(article_content['text']),
+                local.sentiment, local.sentiment_score)
+
+        # An article whose analysis ran into the deadline only has fallback values; drop it
+        if deadline.expired(self.final_analysis_reserve):
+            count("article_dropped_deadline")
+            logger.warning("Dropping article analyzed past the deadline url=%s", url)
+            return "downloaded", None
+
+        return "downloaded", ArticleRecord(
+            title=article_content['title'],
+            url=url,
+            summary=summary,
+            topics=topics,
+            sentiment=sentiment,
+            sentiment_score=sentiment_score,
+            publish_date=article_content['publish_date'],
+            text=article_content['text'] if keep_text else None,
+            analysis_source=analysis_source,
+        )
+
+    def _run_speculative(self, pool, process, max_articles, deadline, downloaded, skipped):
+        """Extract candidates concurrently until max_articles have succeeded.
+
+        About speculative_overprovision extractions run per article still needed
+        (at most speculative_workers), so a failing or slow source doesn't hold
+        up the rest. The first max_articles to succeed are kept and returned in
+        rank order. Once the quota is met, queued work is cancelled and running
+        work stops before its next download or Gemini attempt (including retries
+        and their backoff). There are no
+        politeness delays between articles in this mode.
+        """
+        cancel = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=self.speculative_workers, thread_name_prefix='speculative')
+        in_flight = {}
+        finished = []
+        rank = 0
+        exhausted = False
+        try:
+            while len(finished) < max_articles:
+                if deadline.expired(self.final_analysis_reserve):
+                    logger.warning("Request deadline reached, returning articles=%d", len(finished))
+                    break
+
+                needed = max_articles - len(finished)
+                target = min(self.speculative_workers, math.ceil(needed * self.speculative_overprovision))
+                while not exhausted and len(in_flight) < target:
+                    result = pool.next(needed * self.triage_overfetch)
+                    if result is None:
+                        exhausted = True
+                        break
+                    logger.info("Starting extraction rank=%d url=%s score=%s",
+                                rank, result['url'], result['triage_score'])
+                    # Carry the request's metrics and profiling context into the worker
+                    context = contextvars.copy_context()
+                    in_flight[executor.submit(context.run, process, result, cancel)] = (rank, result['url'])
+                    rank += 1
+
+                if not in_flight:
+                    break
+
+                remaining = deadline.remaining()
+                timeout = None if remaining is None else max(0.0, remaining - self.final_analysis_reserve)
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    position, url = in_flight.pop(future)
+                    status, record = future.result()
+                    (downloaded if status == "downloaded" else skipped).add(url)
+                    if record is not None:
+                        finished.append((position, record))
+        finally:
+            cancel.set()
+            if in_flight:
+                count("speculative_cancelled", len(in_flight))
+                logger.info("Cancelled outstanding extractions=%d", len(in_flight))
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        if len(finished) > max_articles:
+            count("speculative_discarded", len(finished) - max_articles)
+        kept = sorted(finished[:max_articles], key=lambda item: item[0])
+        return [record for _, record in kept]
+
+    def _record_triage(self, searched, downloaded, skipped, analyzed, llm_calls):
+        """Count the downloads and Gemini calls triage saved over taking results in search order.
+
+        Search order would have downloaded the first len(downloaded) eligible
+        candidates; those it would have downloaded but triage did not are the
+        avoided downloads. Avoided LLM calls are estimated from the share of
+        analyzed articles that went to Gemini in this run.
+        """
+        in_search_order = [r['url'] for r in searched if r['url'] not in skipped][:len(downloaded)]
+        avoided = sum(1 for url in in_search_order if url not in downloaded)
+        llm_avoided = round(avoided * llm_calls / analyzed) if analyzed else 0
+        count("triage_candidates", len(searched))
+        count("triage_downloads_avoided", avoided)
+        count("triage_llm_calls_avoided", llm_avoided)
+        logger.info("Triage candidates=%d downloaded=%d downloads_avoided=%d llm_calls_avoided=%d",
+                    len(searched), len(downloaded), avoided, llm_avoided)
+
     def _normalize_dates(self, dates):
         """Convert all dates to naive UTC datetime objects for comparison."""
         from datetime import timezone
@@ -408,26 +835,20 @@ class NewsExtractor:
                 "topics": {}
             }
         
-        # Collect all topics from all articles
-        all_topics = []
-        for article in articles_data:
-            all_topics.extend(article.get('topics', []))
+        # Article x topic matrix over normalized topics ("AI" and "artificial intelligence" count together)
+        topic_matrix = build_topic_matrix(articles_data)
         
-        # Count frequency of each topic
-        topic_counter = Counter(all_topics)
-        common_topics = topic_counter.most_common()
+        # Shared topics appear in at least 2 articles, unique topics in only 1
+        shared_topics, unique_topics = topic_matrix.shared_and_unique()
+        total_topics = len(shared_topics) + len(unique_topics)
         
-        # Find shared topics (appear in at least 2 articles)
-        shared_topics = {topic: count for topic, count in common_topics if count >= 2}
-        
-        # Find unique topics (appear in only 1 article)
-        unique_topics = {topic: count for topic, count in common_topics if count == 1}
+        similar_pairs, mean_similarity = topic_matrix.similar_pairs()
         
         # Generate comparison text
         comparison_text = "Article Comparison:\n"
         
         if shared_topics:
-            topic_percentage = len(shared_topics) / len(common_topics) * 100 if common_topics else 0
+            topic_percentage = len(shared_topics) / total_topics * 100 if total_topics else 0
             comparison_text += f"The articles share {len(shared_topics)} common topics ({topic_percentage:.1f}% of all topics). "
             
             # Analyze how consistent the coverage is
@@ -444,11 +865,15 @@ class NewsExtractor:
         if len(articles_data) >= 3 and shared_topics:
             comparison_text += "Despite covering similar topics, the articles may present different perspectives or emphasize different aspects. "
         
+        if similar_pairs:
+            first, second, similarity = similar_pairs[0]
+            comparison_text += f"Articles {first + 1} and {second + 1} overlap the most ({similarity:.0%} topic similarity; {mean_similarity:.0%} on average across all pairs). "
+        
         # Compare publication dates if available
         dates = []
         for article in articles_data:
-            if article.get('publish_date'):
-                dates.append(article.get('publish_date'))
+            if article.publish_date:
+                dates.append(article.publish_date)
 
         if dates and len(dates) >= 2:
             normalized_dates = self._normalize_dates(dates)
@@ -462,29 +887,26 @@ class NewsExtractor:
         return {
             "comparison": comparison_text,
             "topics": {
-                "shared": dict(sorted(shared_topics.items(), key=lambda x: x[1], reverse=True)),
-                "unique": dict(sorted(unique_topics.items(), key=lambda x: x[1], reverse=True))
-            }
+                "shared": shared_topics,
+                "unique": unique_topics
+            },
+            "similar_articles": [
+                {
+                    "articles": [first + 1, second + 1],
+                    "titles": [articles_data[first].title, articles_data[second].title],
+                    "similarity": similarity
+                }
+                for first, second, similarity in similar_pairs
+            ],
+            "average_similarity": round(mean_similarity, 3),
+            "topic_clusters": topic_matrix.topic_clusters(),
+            "sentiment_by_topic": topic_matrix.sentiment_by_topic(min_articles=2)
         }
 
     def analyze_articles_manually(self, company_name, articles_data):
         """Generate analysis without using the API when it's not working properly."""
-        # Collect all topics
-        all_topics = []
-        for article in articles_data:
-            all_topics.extend(article['topics'])
-        
-        # Count frequency
-        topic_counts = {}
-        for topic in all_topics:
-            if topic in topic_counts:
-                topic_counts[topic] += 1
-            else:
-                topic_counts[topic] = 1
-        
-        # Get top topics
-        sorted_topics = sorted(topic_counts.items(), key=lambda x: x[1], reverse=True)
-        top_topics = [topic for topic, count in sorted_topics[:5]]
+        # Get top topics, with spelling variants of the same topic counted together
+        top_topics = [topic for topic, count in build_topic_matrix(articles_data).top_topics(5)]
         
         # Generate simple analysis
         analysis = f"""
@@ -496,67 +918,113 @@ class NewsExtractor:
         these are currently the most relevant aspects of {company_name}'s 
         business or operations in the public discourse.
         
-        Most recent articles discuss {articles_data[0]['topics'][0] if articles_data and 'topics' in articles_data[0] and articles_data[0]['topics'] else 'various business developments'}.
+        Most recent articles discuss {articles_data[0].topics[0] if articles_data and articles_data[0].topics else 'various business developments'}.
         
         For a comprehensive understanding, review the individual article summaries.
         """
         
         return analysis
 
-    def format_data_for_output(self, company_name, articles_data):
-        """Format the data into the requested output format."""
+    def _format_base(self, company_name, articles_data, deadline):
+        """Everything in the output except the company-level LLM analysis."""
         if not articles_data:
             return {
                 "Company": company_name,
                 "Articles": [],
-                "LLM Analysis": f"No articles were found for {company_name}.",
                 "Comparison": {
                     "comparison": "No articles to compare.",
                     "topics": {}
-                }
+                },
+                "Partial": deadline.exhausted,
+                "Deadline": deadline.to_dict()
             }
 
-        # Format articles
-        formatted_articles = []
-        for article in articles_data:
-            formatted_articles.append({
-                "Title": article['title'],
-                "URL": article['url'],
-                "sentiment" : article['sentiment'],
-                "sentiment_score" : article['sentiment_score'],
-                "Summary": article['summary'],
-                "Topics": article['topics'],
-                "Publish Date": str(article['publish_date']) if article['publish_date'] else "Unknown"
-            })
-
-        # Generate comparison between articles
-        comparison = self.generate_article_comparison(articles_data)
+        return {
+            "Company": company_name,
+            # Format articles
+            "Articles": [article.to_output() for article in articles_data],
+            # Generate comparison between articles
+            "Comparison": self.generate_article_comparison(articles_data),
+            "Partial": deadline.exhausted,
+            "Deadline": deadline.to_dict()
+        }
+
+    def format_data_for_output(self, company_name, articles_data, deadline=None):
+        """Format the data into the requested output format."""
+        deadline = deadline or Deadline()
+        output = self._format_base(company_name, articles_data, deadline)
+        if not articles_data:
+            output["LLM Analysis"] = f"No articles were found for {company_name}."
+            return output
 
         try:
-            # Generate analysis with Gemini
-            analysis_prompt = f"""You are analyzing news about {company_name}. Based on these article summaries, identify the key trends, sentiment, and business implications. 
-            Keep your analysis concise but insightful, focusing on what these news items reveal about the company's current situation and potential future. keep it 1-2 lines long only.
-            
-            Article summaries:
-            """
-            
-            # Add article summaries
-            for i, article in enumerate(formatted_articles[:7]):  # Gemini can handle more articles
-                analysis_prompt += f"\nArticle {i+1}: {article['Title']}. {article['Summary']}\n"
+            if deadline.expired():
+                raise StageTimeout("llm", 0.0)
+
+            # Generate analysis with Gemini from article summaries sized to the prompt budget
+            analysis_prompt = build_analysis_prompt(company_name, output["Articles"], self.analysis_prompt_tokens)
             
-            final_analysis = self.query_gemini(analysis_prompt, 500)
+            final_analysis = self.query_gemini(analysis_prompt, 500, deadline=deadline)
             
             if not final_analysis or len(final_analysis) < 50:
                 # Fallback to rule-based analysis
-                print("Gemini analysis failed, using rule-based analysis...")
+                count("analysis_fallback")
+                logger.warning("Gemini analysis failed, using rule-based analysis...")
                 final_analysis = self.analyze_articles_manually(company_name, articles_data)
         except Exception as e:
-            print(f"Error generating analysis: {str(e)}")
+            count("analysis_fallback")
+            logger.error("Error generating analysis: %s", e)
             final_analysis = self.analyze_articles_manually(company_name, articles_data)
 
-        return {
-            "Company": company_name,
-            "Articles": formatted_articles,
+        output["LLM Analysis"] = final_analysis
+        output["Partial"] = deadline.exhausted
+        output["Deadline"] = deadline.to_dict()
+        return output
+
+    def stream_company_analysis(self, company_name, articles_data, deadline=None):
+        """Streaming variant of format_data_for_output.
+
+        Yields events: first {"type": "result", ...} with everything but the LLM
+        analysis, then {"type": "delta", "text": ...} chunks as Gemini produces them,
+        and finally {"type": "done", "LLM Analysis": <full text>, ...}.
+        """
+        deadline = deadline or Deadline()
+        output = self._format_base(company_name, articles_data, deadline)
+        yield {"type": "result", **output}
+
+        if not articles_data:
+            final_analysis = f"No articles were found for {company_name}."
+            yield {"type": "delta", "text": final_analysis}
+        else:
+            parts = []
+            failed = False
+            try:
+                if deadline.expired():
+                    raise StageTimeout("llm", 0.0)
+                analysis_prompt = build_analysis_prompt(company_name, output["Articles"], self.analysis_prompt_tokens)
+                stream = self.stream_gemini(analysis_prompt, 500, deadline=deadline)
+                try:
+                    for text in stream:
+                        parts.append(text)
+                        yield {"type": "delta", "text": text}
+                finally:
+                    # Runs on client disconnect too, cancelling the Gemini stream
+                    stream.close()
+            except Exception as e:
+                failed = True
+                logger.error("Error streaming analysis: %s", e)
+
+            final_analysis = ''.join(parts)
+            # A stream that broke off mid-way leaves cut-off text; use the rule-based analysis instead
+            if failed or len(final_analysis) < 50:
+                count("analysis_fallback")
+                final_analysis = self.analyze_articles_manually(company_name, articles_data)
+                # Replace whatever partial text was shown with the rule-based analysis
+                yield {"type": "replace", "text": final_analysis}
+
+        yield {
+            "type": "done",
             "LLM Analysis": final_analysis,
-            "Comparison": comparison
+            "Partial": deadline.exhausted,
+            "Deadline": deadline.to_dict()
         }